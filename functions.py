@@ -1,5 +1,9 @@
 import requests
 import csv
+import hashlib
+import os
+import time
+from functools import lru_cache
 import matplotlib.pyplot as plt
 from collections import defaultdict
 import numpy as np
@@ -7,6 +11,10 @@ import numpy as np
 API_URL = "https://louhin.hsl.fi/api/1.0/data/257001?filter[VUOSI]=2024"
 HEADERS = {"Authorization": "LWS d59c041a-2ad1-4beb-b769-b9d7ea3a5628"}
 
+# API responses are saved here and reused until they are older than CACHE_MAX_AGE seconds
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_cache")
+CACHE_MAX_AGE = 24 * 60 * 60
+
 def get_passenger_data():
 
     with requests.Session() as s:
@@ -22,14 +30,47 @@ def get_passenger_data():
 
         print(passenger_data[0])
 
-def load_data():
+def cache_path(url: str):
+    return f"{CACHE_DIR}/{hashlib.sha256(url.encode()).hexdigest()[:16]}.csv"
+
+def download(url: str, path: str):
+    # Stream the response to a file. It is renamed into place only when complete.
+    os.makedirs(CACHE_DIR, exist_ok=True)
     with requests.Session() as s:
-        response = s.get(API_URL, headers=HEADERS)
-        response.encoding = "latin-1"
-        reader = csv.reader(response.text.splitlines(), delimiter=";")
-        rows = list(reader)
+        with s.get(url, headers=HEADERS, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = "latin-1"
+            with open(f"{path}.part", "w", encoding="utf-8", newline="") as f:
+                for line in response.iter_lines(decode_unicode=True):
+                    f.write(line + "\n")
+    os.replace(f"{path}.part", path)
+
+@lru_cache(maxsize=4)
+def read_rows(path: str, mtime: float):
+    # The mtime is part of the key, so a new download is parsed again
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = [row for row in csv.reader(f, delimiter=";") if row]
     return rows[0], rows[1:]
 
+def load_data(use_cache: bool = True, max_age: float = CACHE_MAX_AGE):
+    """
+    Return the header and the rows of the API data. The response is saved on
+    disk and parsed once per session, so the plots below share one download.
+    """
+    if not use_cache:
+        # Parse the rows while the response is streamed instead of decoding the whole body first
+        with requests.Session() as s:
+            with s.get(API_URL, headers=HEADERS, stream=True) as response:
+                response.encoding = "latin-1"
+                lines = response.iter_lines(decode_unicode=True)
+                rows = [row for row in csv.reader(lines, delimiter=";") if row]
+        return rows[0], rows[1:]
+
+    path = cache_path(API_URL)
+    if not os.path.exists(path) or time.time() - os.path.getmtime(path) > max_age:
+        download(API_URL, path)
+    return read_rows(path, os.path.getmtime(path))
+
 
 def plot_monthly_nousijat():
     header, data = load_data()
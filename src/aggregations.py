@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# Directions that are not counted as passengers
+EXCLUDED_DIRECTIONS = ("k1", "k2")
+
+def direction_codes(df):
+    # Integer code of each row's direction and the labels of the codes
+    directions = df["SUUNTA"]
+    if isinstance(directions.dtype, pd.CategoricalDtype):
+        return list(directions.cat.categories), directions.cat.codes.to_numpy()
+    names, codes = np.unique(directions.astype(str).to_numpy(), return_inverse=True)
+    return list(names), codes
+
+def passenger_mask(df):
+    """
+    Rows that count as passengers: not in an excluded direction and not missing (-1).
+    The excluded directions are looked up once per label, and the rows are
+    selected by indexing that lookup table with their integer codes.
+    """
+    names, codes = direction_codes(df)
+
+    # The last element is for rows without a direction (code -1)
+    allowed = np.append(~np.isin(names, EXCLUDED_DIRECTIONS), True)
+    return allowed[codes] & (df["NOUSIJAT"].to_numpy() >= 0)
+
+def totals(keys, passengers, size: int):
+    """
+    Sum passengers into bins 0..size-1 by an integer key.
+    Returns the sums and a boolean array telling which bins had any rows.
+    """
+    keys = np.asarray(keys)
+    valid = (keys >= 0) & (keys < size)
+    keys = keys[valid]
+
+    sums = np.bincount(keys, weights=np.asarray(passengers)[valid], minlength=size)
+    present = np.bincount(keys, minlength=size) > 0
+    return sums.astype(np.int64), present
+
+def column_totals(df, column: str, size: int):
+    mask = passenger_mask(df)
+    return totals(df[column].to_numpy()[mask], df["NOUSIJAT"].to_numpy()[mask], size)
+
+def monthly_totals(df):
+    # Months that have data and their passenger totals
+    sums, present = column_totals(df, "KUUKAUSI", 13)
+    months = np.flatnonzero(present)
+    return months, sums[months]
+
+def weekly_totals(df):
+    # Weeks that have data and their passenger totals
+    sums, present = column_totals(df, "VIIKKO", 54)
+    weeks = np.flatnonzero(present)
+    return weeks, sums[weeks]
+
+def weekday_totals(df):
+    # Passenger totals for weekdays 0-6
+    sums, _ = column_totals(df, "PÄIVÄ", 7)
+    return sums
+
+def hourly_totals(df):
+    # Passenger totals for hours 0-23
+    sums, _ = column_totals(df, "TUNTI", 24)
+    return sums
+
+def hourly_totals_by_direction(df):
+    """
+    Passenger totals for hours 0-23 in each direction.
+    Returns the directions and a (directions x 24) array of totals.
+    """
+    mask = passenger_mask(df)
+    names, codes = direction_codes(df)
+    codes = codes[mask].astype(np.int64)
+
+    hours = df["TUNTI"].to_numpy()[mask]
+    valid = (hours >= 0) & (hours < 24) & (codes >= 0)
+    keys = codes[valid] * 24 + hours[valid]
+
+    sums, present = totals(keys, df["NOUSIJAT"].to_numpy()[mask][valid], len(names) * 24)
+    sums, present = sums.reshape(len(names), 24), present.reshape(len(names), 24)
+
+    # Only the directions that have data, in alphabetical order
+    used = sorted(np.flatnonzero(present.any(axis=1)), key=lambda i: names[i])
+    return [names[i] for i in used], sums[used]
+
+def totals_by_year(df, column: str, size: int):
+    """
+    Passenger totals for bins 0..size-1 of a column in each year of df.
+    Returns the years, a (years x size) array of totals and a boolean array
+    telling which bins of each year had any rows.
+    """
+    mask = passenger_mask(df)
+    years, codes = np.unique(df["VUOSI"].to_numpy()[mask], return_inverse=True)
+
+    values = df[column].to_numpy()[mask]
+    valid = (values >= 0) & (values < size)
+    keys = codes[valid] * size + values[valid]
+
+    sums, present = totals(keys, df["NOUSIJAT"].to_numpy()[mask][valid], len(years) * size)
+    return [int(y) for y in years], sums.reshape(len(years), size), present.reshape(len(years), size)
+
+# Keys of the rollup cube. Every chart and series is a sum over some of these.
+CUBE_KEYS = ["PÄIVÄMÄÄRÄ", "VUOSI", "KUUKAUSI", "VIIKKO", "PÄIVÄ", "TUNTI", "SUUNTA", "PYSÄKKI", "ALUS"]
+
+def build_cube(df):
+    """
+    Sum the passengers over all the rollup keys in a single pass.
+    The cube has the same columns as the parsed data, so all the totals
+    above can be computed from it directly.
+    """
+    df = df[df["NOUSIJAT"] >= 0]
+    cube = df.groupby(CUBE_KEYS, observed=True, dropna=False)["NOUSIJAT"].sum().reset_index()
+    cube["NOUSIJAT"] = cube["NOUSIJAT"].astype(np.int64)
+    return cube
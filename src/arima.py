@@ -3,8 +3,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 from statsmodels.tsa.arima.model import ARIMA
 from sklearn.metrics import mean_squared_error, mean_absolute_error
+from parallel_search import halving_search
+from model_cache import fit_cached
+from figures import show_or_save
 
-def arima_forecast(df):
+def arima_forecast(df, path: str = None):
     # Fit ARIMA model
     
     # ARIMA params: p, d, q
@@ -15,8 +18,7 @@ def arima_forecast(df):
     train_size = int(len(df) * 0.8)
     train, test = df.iloc[:train_size], df.iloc[train_size:]
 
-    model = ARIMA(train["NOUSIJAT"], order=(3,1,3))
-    model_fit = model.fit()
+    model_fit = fit_cached(ARIMA, train["NOUSIJAT"], {"order": (3,1,3)})
 
     # Forecast
     forecast = model_fit.forecast(steps=len(test))
@@ -41,9 +43,27 @@ def arima_forecast(df):
     plt.xlabel('Date')
     plt.ylabel('Passengers')
     plt.legend()
-    plt.show()
+    show_or_save(path)
 
-def optimal_arima_params(data):
+def arima_candidate(data, order, maxiter=50):
+    # Fit one ARIMA candidate with at most maxiter optimizer iterations
+    results = ARIMA(data, order=order).fit(method_kwargs={"maxiter": maxiter})
+    return {"aic": results.aic}
+
+def arima_neighbours(candidate):
+    # Orders that differ from the given one by one step in p, d or q
+    order, = candidate
+    limits = [3, 2, 3]
+    for i in range(3):
+        for step in (-1, 1):
+            new = list(order)
+            new[i] += step
+            if 0 <= new[i] <= limits[i]:
+                yield (tuple(new),)
+
+def optimal_arima_params(data, search: str = "grid", keep: float = 0.2, workers: int = None):
+    # With search="halving" the orders are screened with a few optimizer iterations
+    # and only the most promising ones are fitted fully, see halving_search
     p = range(0, 4)
     d = range(0, 3)
     q = range(0, 4)
@@ -53,6 +73,17 @@ def optimal_arima_params(data):
     best_order = None
     best_model = None
 
+    if search == "halving":
+        fits = halving_search(arima_candidate, (data,), [(order,) for order in pdq], keep=keep,
+                              neighbours=arima_neighbours, workers=workers)
+        for fit in fits:
+            if fit["stage"] != "screen" and fit["status"] == "ok" and fit["aic"] < best_aic:
+                best_aic = fit["aic"]
+                best_order = fit["candidate"][0]
+
+        print(f'Best ARIMA order: {best_order} with AIC: {best_aic}')
+        return
+
     for order in pdq:
         try:
             model = ARIMA(data, order=order)
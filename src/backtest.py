@@ -0,0 +1,101 @@
+import warnings
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from parallel_search import parallel_map
+
+warnings.filterwarnings("ignore", category=UserWarning, module="statsmodels")
+
+# Models compared by default: name -> (order, seasonal order)
+MODELS = {
+    "sarimax": ((3, 1, 3), (1, 1, 0, 12)),
+    "arima": ((3, 1, 3), (0, 0, 0, 0)),
+}
+
+def backtest_block(series, origins, order, seasonal_order, horizon, window, method):
+    """
+    Forecast `horizon` steps from each origin of a block of consecutive origins.
+    The model is fitted once at the first origin. At the later origins the
+    fitted results are only updated with the new observations, extend for an
+    expanding window and apply for a sliding window, which reuses the fitted
+    parameters instead of refitting.
+    """
+    first = origins[0]
+    start = 0 if window is None else max(0, first - window)
+    model = SARIMAX(series.iloc[start:first], order=order, seasonal_order=seasonal_order)
+    results = model.fit(method=method, disp=False)
+
+    rows = []
+    prev = first
+    for origin in origins:
+        if origin > prev:
+            if window is None:
+                results = results.extend(series.iloc[prev:origin])
+            else:
+                results = results.apply(series.iloc[max(0, origin - window):origin])
+            prev = origin
+
+        actual = series.iloc[origin:origin + horizon].to_numpy()
+        fc = np.asarray(results.forecast(steps=horizon))[:len(actual)]
+        error = np.abs(actual - fc)
+
+        rows.append({
+            "origin": series.index[origin],
+            "steps": len(actual),
+            "mae": error.mean(),
+            "rmse": np.sqrt((error**2).mean()),
+            "ratio": error.mean() / actual.mean()
+        })
+
+    return {"rows": rows}
+
+def backtest(series, models: dict = None, horizon: int = 12, initial: int = 36, step: int = 1,
+             window: int = None, refit_every: int = 12, method: str = "bfgs",
+             workers: int = None):
+    """
+    Rolling-origin backtest of the models on a series with a set frequency.
+
+    Forecasts are made from every `step`th origin after the first `initial`
+    observations, with an expanding window or, if window is given, a sliding
+    window of that many observations. The origins are split into blocks of
+    `refit_every` origins, the blocks of all models run in parallel and the
+    model is refitted only at the start of each block.
+
+    Returns a table of the mean MAE, RMSE and ratio per model and the errors
+    of every origin. Both are empty if every block failed.
+    """
+    models = models or MODELS
+    origins = list(range(initial, len(series), step))
+    blocks = [origins[i:i + refit_every] for i in range(0, len(origins), refit_every)]
+
+    tasks = [(series, block, order, seasonal_order, horizon, window, method)
+             for order, seasonal_order in models.values()
+             for block in blocks]
+    results = parallel_map(backtest_block, tasks, workers)
+
+    rows = []
+    names = [name for name in models for _ in blocks]
+    for name, result in zip(names, results):
+        if result["status"] != "ok":
+            print(f"Backtest of {name} failed on a block: {result['status']}")
+            continue
+        rows.extend({"model": name, **row} for row in result["rows"])
+
+    details = pd.DataFrame(rows, columns=["model", "origin", "steps", "mae", "rmse", "ratio"])
+    if details.empty:
+        print("Every backtest block failed")
+        return pd.DataFrame(columns=["mae", "rmse", "ratio", "origins"]), details
+
+    summary = details.groupby("model")[["mae", "rmse", "ratio"]].mean()
+    summary["origins"] = details.groupby("model").size()
+
+    return summary.sort_values("mae"), details
+
+if __name__ == "__main__":
+    from sarimax import get_data
+
+    df = pd.concat([get_data(year) for year in range(2016, 2025)])
+    df = df.set_index("PÄIVÄMÄÄRÄ").asfreq("ME")
+
+    summary, details = backtest(df["NOUSIJAT"])
+    print(summary)
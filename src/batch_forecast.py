@@ -0,0 +1,110 @@
+import warnings
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from statsmodels.tsa.arima.model import ARIMA
+from storage import read_rollup
+from aggregations import passenger_mask
+from parallel_search import parallel_map
+from skforecast_backend import skforecast_forecast
+
+warnings.filterwarnings("ignore", category=UserWarning, module="statsmodels")
+
+# Columns that can be forecast separately
+GROUPS = ["PYSÄKKI", "SUUNTA", "ALUS"]
+
+def build_series(years, groups=GROUPS, freq: str = "ME"):
+    """
+    Build a passenger series for every value of every group column.
+    The rollup cube is summed by period and all the group columns in one pass,
+    and each group's series are then summed from that small table.
+    Returns a dict of (group, value) -> series.
+    """
+    columns = ["PÄIVÄMÄÄRÄ", *dict.fromkeys(["SUUNTA", *groups]), "NOUSIJAT"]
+    df = read_rollup(years, columns)
+    if df is None:
+        return {}
+    df = df[passenger_mask(df)]
+
+    periods = df.groupby([pd.Grouper(key="PÄIVÄMÄÄRÄ", freq=freq), *groups], observed=True)["NOUSIJAT"].sum()
+
+    series = {}
+    for group in groups:
+        table = periods.groupby(level=["PÄIVÄMÄÄRÄ", group], observed=True).sum().unstack(group, fill_value=0)
+        table = table.asfreq(freq, fill_value=0)
+        for value in table.columns:
+            series[(group, value)] = table[value].rename("NOUSIJAT")
+
+    return series
+
+def statsmodels_frame(fc):
+    # Forecast and its 95% interval from a statsmodels forecast
+    interval = fc.conf_int(alpha=0.05)
+    return pd.DataFrame({
+        "forecast": fc.predicted_mean,
+        "lower": interval.iloc[:, 0],
+        "upper": interval.iloc[:, 1]
+    })
+
+def sarimax_backend(series, horizon, order=(3, 1, 3), seasonal_order=(1, 1, 0, 12), method="bfgs"):
+    results = SARIMAX(series, order=order, seasonal_order=seasonal_order).fit(method=method, disp=False)
+    return statsmodels_frame(results.get_forecast(steps=horizon))
+
+def arima_backend(series, horizon, order=(3, 1, 3)):
+    results = ARIMA(series, order=order).fit()
+    return statsmodels_frame(results.get_forecast(steps=horizon))
+
+def skforecast_backend(series, horizon, lags=12, kind="recursive"):
+    return skforecast_forecast(series.astype(float), horizon, lags, kind)
+
+# Forecasting backends: name -> function(series, horizon, **kwargs) returning a dataframe
+# of the forecast and its interval (columns forecast, lower and upper) indexed by date
+BACKENDS = {
+    "sarimax": sarimax_backend,
+    "arima": arima_backend,
+    "skforecast": skforecast_backend,
+}
+
+def forecast_series(backend, series, horizon, kwargs):
+    # Fit one series and return its forecast with a 95% interval as plain lists.
+    # Clipped at 0 so that all the backends give valid passenger counts.
+    fc = BACKENDS[backend](series, horizon, **kwargs).clip(lower=0)
+    return {"date": list(fc.index), **{col: list(fc[col]) for col in fc.columns}}
+
+def batch_forecast(years, groups=GROUPS, freq: str = "ME", horizon: int = 12,
+                   backend: str = "sarimax", workers: int = None, **kwargs):
+    """
+    Forecast the passengers of every stop, direction and vessel.
+    The series are fitted in parallel and the forecasts are returned as one
+    table with the columns group, value, date, forecast, lower and upper.
+    Extra keyword arguments are passed to the backend.
+    """
+    series = build_series(years, groups, freq)
+    if not series:
+        print("No data available for the selected years.")
+        return None
+
+    keys = list(series)
+    tasks = [(backend, series[key], horizon, kwargs) for key in keys]
+    results = parallel_map(forecast_series, tasks, workers)
+
+    frames = []
+    failed = []
+    for (group, value), result in zip(keys, results):
+        status = result.pop("status")
+        if status != "ok":
+            print(f"Forecast of {group} {value} failed: {status}")
+            failed.append(f"{group} {value}")
+            continue
+        frame = pd.DataFrame(result)
+        frame.insert(0, "group", group)
+        frame.insert(1, "value", value)
+        frames.append(frame)
+
+    if not frames:
+        print(f"Every forecast failed ({', '.join(failed)})")
+        return None
+
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == "__main__":
+    print(batch_forecast(range(2019, 2025)))
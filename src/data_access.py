@@ -0,0 +1,29 @@
+from functools import lru_cache
+from storage import read_rollup, parsed_files, parsed_stamp
+
+# Rollup cubes kept in memory. A cube is a few hundred kilobytes, so this is mostly a bound
+# for long sessions going through many years.
+MAX_YEARS = 16
+
+@lru_cache(maxsize=MAX_YEARS)
+def _read_cube(year: int, stamp: str):
+    return read_rollup([year])
+
+def year_data(year: int, columns: list = None):
+    """
+    The rollup cube of a year, or the given columns of it, read from disk only
+    once per session. The cache is keyed by the year and the stamp of its parsed
+    files, so a year that is cleaned again is read again. The returned frame is
+    shared between callers when columns is not given, so it must not be modified.
+    """
+    if not parsed_files(year):
+        print(f"Found no parsed data from {year}")
+        return None
+
+    df = _read_cube(year, parsed_stamp(year))
+    if df is None or columns is None:
+        return df
+    return df[columns]
+
+def clear_cache():
+    _read_cube.cache_clear()
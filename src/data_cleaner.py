@@ -1,6 +1,9 @@
 import pandas as pd
+from storage import set_types, write_parsed, write_rollup
+from aggregations import build_cube
+from sqlite_store import load_year
 
-def clean_data(path: str, columns: list):
+def clean_data(path: str, columns: list, by_month: bool = False):
     # Clean the raw data
     try:
         df = pd.read_csv(path, header=1, index_col=0)
@@ -9,15 +12,21 @@ def clean_data(path: str, columns: list):
         return
 
     print("Cleaning data...")
-    year = df.iloc[0]["VUOSI"]
+    year = int(df.iloc[0]["VUOSI"])
 
     # Drop unnecessary columns
     df = df.drop(df.columns[0], axis=1)
     df = df.drop(columns=columns)
 
-    # Replace NaN values with -1
-    df = df.fillna(-1)
+    # Convert the columns to typed ones and replace NaN values with -1
+    df = set_types(df)
 
-    df.to_csv(f"../parsed_data_{year}.csv")
+    write_parsed(df, year, by_month)
+
+    # Passenger sums by date, hour, direction, stop and vessel for the charts and models
+    write_rollup(build_cube(df), year)
+
+    # All the years are also kept in one database file for SQL queries across years
+    load_year(df, year)
 
     print("Data cleaning finished")
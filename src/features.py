@@ -0,0 +1,125 @@
+import json
+import os
+import pandas as pd
+from storage import file_stamp
+
+# Weather and event features are extracted from the raw data into
+# ../features/features_2024.parquet, one row per date and hour
+FEATURE_DIR = "../features"
+
+WEATHER_COLUMNS = ["LÄMPÖTILA_PÄIVÄ", "SADE_PÄIVÄ", "TUULI"]
+FLAG_COLUMNS = ["TAPAHTUMA", "LOMA", "AJAMATON"]
+
+def feature_path(year: int):
+    return f"{FEATURE_DIR}/features_{year}.parquet"
+
+def extract_features(path: str):
+    """
+    Read the feature columns of a raw data file into a table with one row per
+    date and hour. Weather columns are floats and TAPAHTUMA, LOMA and AJAMATON
+    are 0/1 flags telling whether the hour had an event, a holiday or a
+    cancelled departure.
+    """
+    df = pd.read_csv(path, header=1, usecols=["PÄIVÄMÄÄRÄ", "TUNTI", *WEATHER_COLUMNS, *FLAG_COLUMNS])
+
+    df["PÄIVÄMÄÄRÄ"] = pd.to_datetime(df["PÄIVÄMÄÄRÄ"], errors="coerce")
+    df["TUNTI"] = pd.to_numeric(df["TUNTI"], errors="coerce")
+    df = df.dropna(subset=["PÄIVÄMÄÄRÄ", "TUNTI"])
+
+    for col in WEATHER_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+
+    # Events are given as text, holidays as numbers and missing values mean no
+    df["TAPAHTUMA"] = df["TAPAHTUMA"].notna() & (df["TAPAHTUMA"].astype(str).str.strip() != "")
+    df["LOMA"] = pd.to_numeric(df["LOMA"], errors="coerce").fillna(0) > 0
+    df["AJAMATON"] = df["AJAMATON"].notna()
+
+    df["TUNTI"] = df["PÄIVÄMÄÄRÄ"] + pd.to_timedelta(df["TUNTI"], unit="h")
+    df = df.groupby("TUNTI").agg({
+        **{col: "mean" for col in WEATHER_COLUMNS},
+        **{col: "max" for col in FLAG_COLUMNS}
+    })
+    df[FLAG_COLUMNS] = df[FLAG_COLUMNS].astype("int8")
+
+    return df
+
+def year_features(year: int):
+    # Features of a year, extracted again only if the raw data has changed since the last extraction
+    raw = f"../raw_data_{year}.csv"
+    if not os.path.exists(raw):
+        print(f"Found no raw data from {year}")
+        return None
+
+    path = feature_path(year)
+    try:
+        with open(f"{path}.json", encoding="utf-8") as f:
+            current = json.load(f)["raw"] == file_stamp([raw]) and os.path.exists(path)
+    except (FileNotFoundError, KeyError, ValueError):
+        current = False
+
+    if current:
+        return pd.read_parquet(path)
+
+    df = extract_features(raw)
+    os.makedirs(FEATURE_DIR, exist_ok=True)
+    part = f"{path}.{os.getpid()}.part"
+    df.to_parquet(part)
+    os.replace(part, path)
+    with open(part, "w", encoding="utf-8") as f:
+        json.dump({"raw": file_stamp([raw])}, f)
+    os.replace(part, f"{path}.json")
+
+    return df
+
+def hourly_features(years):
+    # Features of the given years, indexed by hour
+    frames = [year_features(year) for year in years]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return None
+    return pd.concat(frames).sort_index()
+
+def daily_features(years):
+    # Daily mean weather and whether the day had an event, a holiday or a cancelled departure
+    df = hourly_features(years)
+    if df is None:
+        return None
+
+    return df.resample("D").agg({
+        **{col: "mean" for col in WEATHER_COLUMNS},
+        **{col: "max" for col in FLAG_COLUMNS}
+    }).dropna(how="all").rename_axis("PÄIVÄMÄÄRÄ")
+
+def monthly_features(years):
+    # Monthly mean temperature and wind, total rain and the number of event, holiday and cancellation days
+    df = daily_features(years)
+    if df is None:
+        return None
+
+    return df.resample("ME").agg({
+        "LÄMPÖTILA_PÄIVÄ": "mean",
+        "SADE_PÄIVÄ": "sum",
+        "TUULI": "mean",
+        **{col: "sum" for col in FLAG_COLUMNS}
+    })
+
+# Feature tables by the frequency of the series they are used with
+FREQUENCIES = {"h": hourly_features, "D": daily_features, "ME": monthly_features}
+
+def features_for(index, freq: str = "ME", columns=None):
+    """
+    Features aligned to the dates of a series, e.g. the exog of a model fitted on
+    the series or of its forecast. Missing flags are taken as 0 and missing
+    weather is interpolated from the neighbouring dates.
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(index))
+    df = FREQUENCIES[freq](sorted(set(dates.year)))
+    if df is None:
+        return None
+
+    df = df.reindex(dates)
+    df[FLAG_COLUMNS] = df[FLAG_COLUMNS].fillna(0)
+    df[WEATHER_COLUMNS] = df[WEATHER_COLUMNS].interpolate(limit_direction="both")
+    df.index = index
+
+    return df[columns] if columns is not None else df
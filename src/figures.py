@@ -0,0 +1,12 @@
+import matplotlib.pyplot as plt
+
+# Kept apart from the chart modules, so the models can save their plots
+# without importing the data access and aggregation code of the charts.
+
+def show_or_save(path: str = None):
+    # Show the current figure, or save it to path (PNG or SVG by the extension) and close it
+    if path is None:
+        plt.show()
+        return
+    plt.savefig(path)
+    plt.close()
@@ -0,0 +1,106 @@
+import warnings
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from sklearn.linear_model import LinearRegression
+from series_cache import hourly_series
+from skforecast_backend import skforecast_forecast
+
+warnings.filterwarnings("ignore", category=UserWarning, module="statsmodels")
+
+# Daily and weekly seasons of hourly data
+SEASONS = {"daily": 24, "weekly": 168}
+
+def fourier_terms(index, terms: dict):
+    """
+    Sine and cosine terms of each season for the given hourly index.
+    terms maps a season in SEASONS to its number of harmonics. Time is counted
+    from a fixed epoch, so the terms of future hours line up with the past ones.
+    """
+    t = (index - pd.Timestamp(0)) / pd.Timedelta(hours=1)
+    t = np.asarray(t, dtype=float)
+
+    columns = {}
+    for season, k in terms.items():
+        period = SEASONS[season]
+        for i in range(1, k + 1):
+            columns[f"{season}_sin_{i}"] = np.sin(2 * np.pi * i * t / period)
+            columns[f"{season}_cos_{i}"] = np.cos(2 * np.pi * i * t / period)
+    return pd.DataFrame(columns, index=index)
+
+def future_index(series, horizon: int):
+    return pd.date_range(series.index[-1] + pd.Timedelta(hours=1), periods=horizon, freq="h")
+
+def fourier_sarimax_forecast(series, horizon: int, terms=None, order=(2, 0, 1)):
+    """
+    SARIMAX with the daily and weekly seasons given as Fourier exogenous terms.
+    A seasonal order of 168 would need a state vector of hundreds of elements,
+    whereas a few harmonics per season keep the model small.
+    """
+    terms = terms or {"daily": 6, "weekly": 3}
+    exog = fourier_terms(series.index, terms)
+
+    results = SARIMAX(series, exog=exog, order=order).fit(disp=False)
+
+    future = future_index(series, horizon)
+    return results.forecast(steps=horizon, exog=fourier_terms(future, terms))
+
+def lag_regressor_forecast(series, horizon: int, lags=(1, 2, 3, 24, 168), terms=None):
+    """
+    Linear regression on selected lags and Fourier terms, forecast recursively.
+    The history and the forecasts share one preallocated array, so each step
+    only reads the lags it needs from it.
+    """
+    terms = terms or {"daily": 6, "weekly": 3}
+    lags = np.asarray(lags)
+    max_lag = lags.max()
+
+    values = series.to_numpy(dtype=float)
+    exog = fourier_terms(series.index, terms).to_numpy()
+
+    # Row t holds the lags of time t
+    t = np.arange(max_lag, len(values))
+    X = np.hstack([values[t[:, None] - lags], exog[t]])
+    model = LinearRegression().fit(X, values[t])
+
+    future_exog = fourier_terms(future_index(series, horizon), terms).to_numpy()
+    buffer = np.concatenate([values[-max_lag:], np.empty(horizon)])
+
+    for step in range(horizon):
+        x = np.concatenate([buffer[max_lag + step - lags], future_exog[step]])
+        buffer[max_lag + step] = max(0.0, model.predict(x.reshape(1, -1))[0])
+
+    return pd.Series(buffer[max_lag:], index=future_index(series, horizon), name=series.name)
+
+def skforecast_hourly_forecast(series, horizon: int, lags=(1, 2, 3, 24, 168), terms=None):
+    # The lag regressor above built on skforecast's recursive forecaster
+    terms = terms or {"daily": 6, "weekly": 3}
+    exog = fourier_terms(series.index, terms)
+    future_exog = fourier_terms(future_index(series, horizon), terms)
+
+    fc = skforecast_forecast(series.astype(float), horizon, list(lags), exog=exog, future_exog=future_exog)
+    return fc["forecast"].rename(series.name)
+
+# Hourly forecasting methods: name -> function(series, horizon)
+METHODS = {
+    "sarimax": fourier_sarimax_forecast,
+    "regressor": lag_regressor_forecast,
+    "skforecast": skforecast_hourly_forecast,
+}
+
+def hourly_forecast(years, horizon: int = 168, method: str = "regressor", directions=("s1", "s2")):
+    # Forecast the passengers of each direction hour by hour
+    forecasts = {}
+    for direction in directions:
+        series = hourly_series(years, [direction])
+        if series is None:
+            return None
+        # Hours between years without data are zeros, the models need a regular index
+        series = series.asfreq("h", fill_value=0)
+        # Passenger counts can't be negative, whatever the method
+        forecasts[direction] = METHODS[method](series, horizon).clip(lower=0)
+
+    return pd.DataFrame(forecasts)
+
+if __name__ == "__main__":
+    print(hourly_forecast([2023, 2024]))
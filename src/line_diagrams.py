@@ -1,212 +1,110 @@
-import csv
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mtick
-from collections import defaultdict
-
-def get_data(year: int):
-    # Read a csv file and return its contents
-    try:
-        with open(f"../parsed_data_{year}.csv", newline='', encoding="utf-8") as csvfile:
-            reader = csv.reader(csvfile, delimiter=",")
-            rows = list(reader)
-    except FileNotFoundError:
-        print(f"Found no parsed data from {year}")
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from storage import parsed_years, concat_frames
+from data_access import year_data
+from aggregations import totals_by_year
+from figures import show_or_save
+
+# Reading a year is mostly parquet decoding, which releases the GIL
+MAX_THREADS = 8
+
+def get_cube(year: int):
+    # The rollup cube of a year is shared with the other charts through data_access
+    return year_data(year, ["VUOSI", "KUUKAUSI", "PÄIVÄ", "TUNTI", "SUUNTA", "NOUSIJAT"])
+
+def get_cubes(years):
+    # Read the cubes of the given years in parallel into one dataframe. Years without data are skipped.
+    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+        cubes = [cube for cube in executor.map(get_cube, years) if cube is not None]
+    if not cubes:
+        print("No data available for the selected years.")
         return None
-    
-    return rows
-
-def get_counts_per_month(header, data):
-    idx_month = header.index("KUUKAUSI")
-    idx_passengers = header.index("NOUSIJAT")
-    idx_direction = header.index("SUUNTA")
-
-    monthly_counts = defaultdict(int)
-    for row in data:
-        try:
-            month = int(row[idx_month])
-            passengers = int(row[idx_passengers])
-            direction = row[idx_direction]
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            monthly_counts[month] += passengers
-
-    months = sorted(monthly_counts.keys())
-    counts = [monthly_counts[m] for m in months]
-
-    return months, counts
-
-def get_counts_per_hour(header, data):
-    idx_year = header.index("VUOSI")
-    idx_hour = header.index("TUNTI")
-    idx_passengers = header.index("NOUSIJAT")
-    idx_direction = header.index("SUUNTA")
-
-    hourly_counts = defaultdict(int)
-
-    for row in data:
-        try:
-            year = int(row[idx_year])
-            hour = int(row[idx_hour])
-            passengers = int(row[idx_passengers])
-            direction = row[idx_direction]
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            hourly_counts[hour] += passengers
-
-    hours = range(0, 24)
-    counts = [hourly_counts[h] for h in hours]
-
-    return counts
-    
-def get_counts_per_weekday(header, data):
-    idx_weekday = header.index("PÄIVÄ")
-    idx_passengers = header.index("NOUSIJAT")
-    idx_direction = header.index("SUUNTA")
-
-    weekday_counts = defaultdict(int)
-
-    for row in data:
-        try:
-            weekday = int(row[idx_weekday])
-            passengers = int(row[idx_passengers])
-            direction = row[idx_direction]
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            weekday_counts[weekday] += passengers
-
-    weekdays = range(0, 7)
-    counts = [weekday_counts[d] for d in weekdays]
-
-    return counts
-
-def line_diagram_monthly_nousijat():
-
-    rows = get_data(2022)
-    if rows is None:
-        return
-
-    header, data = rows[0], rows[1:]
-    months, counts = get_counts_per_month(header, data)
-
-    rows2 = get_data(2023)
-    if rows2 is None:
-        return
-
-    header, data = rows2[0], rows2[1:]
-    _, counts2 = get_counts_per_month(header, data)
+    # Cubes read earlier in the session may have fewer categories than ones read after a new label
+    return concat_frames(cubes)
+
+def get_matrix(years, column: str, size: int):
+    """
+    Passengers of the given years in bins 0..size-1 of a column.
+    Returns the years found, a (years x size) array of totals and a boolean
+    array telling which bins of each year had any data.
+    """
+    df = get_cubes(years or parsed_years())
+    if df is None:
+        return None, None, None
+
+    return totals_by_year(df, column, size)
+
+def plot_lines(x, years, matrix):
+    # One line per row of the years x bins matrix
+    for year, counts in zip(years, matrix):
+        plt.plot(x, counts, label=year)
+    plt.legend(loc="upper left")
+    plt.grid(True, which="major", linestyle="--", linewidth=0.7, alpha=0.7)
 
-    rows3 = get_data(2024)
-    if rows3 is None:
+def line_diagram_monthly_nousijat(years=None, path: str = None):
+    # Monthly passengers of the given years (all parsed years by default), one line per year
+    found, matrix, present = get_matrix(years, "KUUKAUSI", 13)
+    if found is None:
         return
 
-    header, data = rows3[0], rows3[1:]
-    _, counts3 = get_counts_per_month(header, data)
+    # Months without data are left out of the lines
+    matrix = np.where(present, matrix, np.nan)
 
-    month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
+    month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
           "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-    
+
     plt.figure(figsize=(10, 6))
-    plt.plot(months, counts, label=2022)
-    plt.plot(months, counts2, label=2023)
-    plt.plot(months, counts3, label=2024)
-    plt.legend(loc="upper left")
+    plot_lines(range(1, 13), found, matrix[:, 1:])
     plt.xticks(range(1, 13), month_names)
 
     plt.gca().yaxis.set_major_formatter(mtick.StrMethodFormatter('{x:,.0f}'))
-    plt.grid(True, which="major", linestyle="--", linewidth=0.7, alpha=0.7)
     plt.xlabel("Month")
     plt.ylabel("Passengers")
 
     plt.title("Monthly passengers")
     plt.tight_layout()
-    plt.show()
-
-def line_diagram_weekly_nousijat():
-    rows = get_data(2022)
-    if rows is None:
-        return
-
-    header, data = rows[0], rows[1:]
-    counts = get_counts_per_weekday(header, data)
-
-    rows2 = get_data(2023)
-    if rows2 is None:
-        return
-
-    header, data = rows2[0], rows2[1:]
-    counts2 = get_counts_per_weekday(header, data)
+    show_or_save(path)
 
-    rows3 = get_data(2024)
-    if rows3 is None:
+def line_diagram_weekly_nousijat(years=None, path: str = None):
+    found, matrix, _ = get_matrix(years, "PÄIVÄ", 7)
+    if found is None:
         return
 
-    header, data = rows3[0], rows3[1:]
-    counts3 = get_counts_per_weekday(header, data)
-
     weekday_labels = ["Mon", "Tues", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
     plt.figure(figsize=(10, 6))
-    plt.plot(weekday_labels, counts, label=2022)
-    plt.plot(weekday_labels, counts2, label=2023)
-    plt.plot(weekday_labels, counts3, label=2024)
-    plt.legend(loc="upper left")
+    plot_lines(weekday_labels, found, matrix)
 
     plt.gca().yaxis.set_major_formatter(mtick.StrMethodFormatter('{x:,.0f}'))
-    plt.grid(True, which="major", linestyle="--", linewidth=0.7, alpha=0.7)
-    plt.ylim(190000, 450000)
     plt.xlabel("Day")
     plt.ylabel("Passengers")
 
     plt.title("Weekly passengers")
     plt.tight_layout()
-    plt.show()
+    show_or_save(path)
 
-def line_diagram_hourly_nousijat():
-    rows = get_data(2022)
-    if rows is None:
+def line_diagram_hourly_nousijat(years=None, path: str = None):
+    found, matrix, _ = get_matrix(years, "TUNTI", 24)
+    if found is None:
         return
 
-    header, data = rows[0], rows[1:]
-    counts = get_counts_per_hour(header, data)
-
-    rows2 = get_data(2023)
-    if rows2 is None:
-        return
-
-    header, data = rows2[0], rows2[1:]
-    counts2 = get_counts_per_hour(header, data)
-
-    rows3 = get_data(2024)
-    if rows3 is None:
-        return
-
-    header, data = rows3[0], rows3[1:]
-    counts3 = get_counts_per_hour(header, data)
-
     hours = range(0, 24)
 
     plt.figure(figsize=(10, 6))
-    plt.plot(hours, counts, label=2022)
-    plt.plot(hours, counts2, label=2023)
-    plt.plot(hours, counts3, label=2024)
-    plt.legend(loc="upper left")
+    plot_lines(hours, found, matrix)
     plt.xticks(hours)
 
-    plt.grid(True, which="major", linestyle="--", linewidth=0.7, alpha=0.7)
     plt.xlabel("Hour")
     plt.ylabel("Passengers")
 
     plt.title("Hourly passengers")
     plt.tight_layout()
-    plt.show()
+    show_or_save(path)
 
 if __name__ == "__main__":
-    #line_diagram_monthly_nousijat()
-    #line_diagram_weekly_nousijat()
-    line_diagram_hourly_nousijat()
+    #line_diagram_monthly_nousijat([2022, 2023, 2024])
+    #line_diagram_weekly_nousijat([2022, 2023, 2024])
+    line_diagram_hourly_nousijat([2022, 2023, 2024])
@@ -0,0 +1,65 @@
+import glob
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from statsmodels.iolib.smpickle import load_pickle
+
+# Fitted models are pickled here, named by the hash of their training data and parameters
+CACHE_DIR = "../model_cache"
+
+# Least recently used models are removed when either limit is exceeded
+MAX_ENTRIES = 50
+MAX_BYTES = 500 * 1024**2
+
+def hash_data(h, data):
+    # Add the values and index of a series or dataframe to the hash. Their repr is truncated.
+    if isinstance(data, pd.Series) or data.ndim == 1:
+        data = pd.Series(data)
+    h.update(pd.util.hash_pandas_object(pd.DataFrame(data), index=True).to_numpy().tobytes())
+
+def cache_key(model_cls, endog, model_kwargs: dict, fit_kwargs: dict):
+    # Hash of the training series (values and index) and everything passed to the model and the fit
+    h = hashlib.sha256()
+    hash_data(h, endog)
+    h.update(model_cls.__name__.encode())
+    for kwargs in (model_kwargs, fit_kwargs):
+        for key, value in sorted(kwargs.items()):
+            h.update(key.encode())
+            if isinstance(value, (pd.Series, pd.DataFrame, np.ndarray)):
+                hash_data(h, value)
+            else:
+                h.update(repr(value).encode())
+    return h.hexdigest()
+
+def evict():
+    # Remove the least recently used models until the cache is within its limits
+    files = sorted(glob.glob(f"{CACHE_DIR}/*.pickle"), key=os.path.getmtime)
+    sizes = [os.path.getsize(f) for f in files]
+
+    while files and (len(files) > MAX_ENTRIES or sum(sizes) > MAX_BYTES):
+        os.remove(files.pop(0))
+        sizes.pop(0)
+
+def fit_cached(model_cls, endog, model_kwargs: dict, fit_kwargs: dict = None):
+    """
+    Return model_cls(endog, **model_kwargs).fit(**fit_kwargs), loading the
+    fitted results from the cache if the same model has been fitted on the same
+    data before.
+    """
+    fit_kwargs = fit_kwargs or {}
+    path = f"{CACHE_DIR}/{cache_key(model_cls, endog, model_kwargs, fit_kwargs)}.pickle"
+
+    if os.path.exists(path):
+        # Mark as recently used
+        os.utime(path)
+        return load_pickle(path)
+
+    results = model_cls(endog, **model_kwargs).fit(**fit_kwargs)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    results.save(f"{path}.part")
+    os.replace(f"{path}.part", path)
+    evict()
+
+    return results
@@ -0,0 +1,99 @@
+import os
+import math
+import signal
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+class FitTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise FitTimeout()
+
+def run_with_timeout(fn, args, timeout):
+    # Run fn(*args), raising FitTimeout if it takes longer than timeout seconds
+    if timeout is None:
+        return fn(*args)
+
+    old_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+def run_task(fn, timeout, task):
+    # Evaluate one task in a worker. Failures are returned as a status instead of raised.
+    try:
+        result = run_with_timeout(fn, task, timeout)
+    except FitTimeout:
+        return {"status": "timeout"}
+    except Exception as e:
+        return {"status": f"failed: {e}"}
+
+    return {"status": "ok", **result}
+
+def parallel_map(fn, tasks: list, workers: int = None, timeout: float = None):
+    """
+    Evaluate fn(*task) for every task in a process pool of `workers` processes.
+    fn must return a dict and be importable by the workers (a module level function).
+    Each task gets at most `timeout` seconds. The results are returned in the
+    order of the tasks regardless of which worker finished first.
+    """
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (workers * 4))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(partial(run_task, fn, timeout), tasks, chunksize=chunksize))
+
+def halving_search(fn, data: tuple, candidates: list, screen_iter: int = 5, full_iter: int = 50,
+                   keep: float = 0.1, screen_key: str = "aic", score_key: str = "aic",
+                   neighbours=None, workers: int = None, timeout: float = None):
+    """
+    Search the candidates without fully fitting all of them.
+    fn is called as fn(*data, *candidate, maxiter) and must return a dict.
+
+    1. Every candidate is fitted with only `screen_iter` optimizer iterations
+       and ranked by result[screen_key].
+    2. The best `keep` fraction is fitted with `full_iter` iterations and
+       ranked by result[score_key].
+    3. If neighbours is given, the candidates returned by neighbours(best) are
+       fitted fully as well, moving to a better neighbour until none is found.
+
+    Returns a list of dicts with the candidate, the stage and the result of every fit.
+    """
+    def run(stage, params, maxiter):
+        tasks = [(*data, *c, maxiter) for c in params]
+        results = parallel_map(fn, tasks, workers, timeout)
+        return [{"candidate": c, "stage": stage, **r} for c, r in zip(params, results)]
+
+    def ranked(fits, key):
+        fits = [f for f in fits if f["status"] == "ok" and math.isfinite(f[key])]
+        return sorted(fits, key=lambda f: f[key])
+
+    screened = run("screen", candidates, screen_iter)
+    n_keep = max(1, int(len(candidates) * keep))
+    promising = [f["candidate"] for f in ranked(screened, screen_key)[:n_keep]]
+
+    fitted = run("full", promising, full_iter)
+    best = ranked(fitted, score_key)
+    if neighbours is None or not best:
+        return screened + fitted
+
+    best = best[0]
+    seen = set(promising)
+    while True:
+        new = [c for c in neighbours(best["candidate"]) if c not in seen]
+        if not new:
+            break
+        seen.update(new)
+
+        step = run("stepwise", new, full_iter)
+        fitted += step
+        step = ranked(step, score_key)
+        if not step or step[0][score_key] >= best[score_key]:
+            break
+        best = step[0]
+
+    return screened + fitted
@@ -1,44 +1,30 @@
-import csv
 import matplotlib.pyplot as plt
-from collections import defaultdict
 import numpy as np
-
-def get_data(year: int):
-    # Read a csv file and return its contents
-    try:
-        with open(f"../parsed_data_{year}.csv", newline='', encoding="utf-8") as csvfile:
-            reader = csv.reader(csvfile, delimiter=",")
-            rows = list(reader)
-    except FileNotFoundError:
-        print(f"Found no parsed data from {year}")
-        return None
-    
-    return rows 
-
-def plot_monthly_nousijat(year: int):
-    rows = get_data(year)
-    if rows is None:
+import sqlite_store
+import sql_queries
+from figures import show_or_save
+from data_access import year_data
+from aggregations import (
+    monthly_totals,
+    weekday_totals,
+    hourly_totals,
+    hourly_totals_by_direction,
+    weekly_totals
+)
+
+# The plots of a year read their data with get_data unless df, e.g. the whole
+# rollup cube of the year, is given
+def get_data(year: int, columns: list):
+    # The given columns of the rollup cube of a year, read once per session
+    return year_data(year, columns)
+
+def plot_monthly_nousijat(year: int, path: str = None, df=None):
+    if df is None:
+        df = get_data(year, ["KUUKAUSI", "NOUSIJAT", "SUUNTA"])
+    if df is None:
         return
 
-    header, data = rows[0], rows[1:]
-    idx_month = header.index("KUUKAUSI")
-    idx_passengers = header.index("NOUSIJAT")
-    idx_direction = header.index("SUUNTA")
-
-    monthly_counts = defaultdict(int)
-    for row in data:
-        try:
-            month = int(row[idx_month])
-            passengers = int(row[idx_passengers])
-            direction = row[idx_direction]
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            monthly_counts[month] += passengers
-
-    months = sorted(monthly_counts.keys())
-    counts = [monthly_counts[m] for m in months]
+    months, counts = monthly_totals(df)
 
     plt.figure(figsize=(10, 6))
     plt.bar(months, counts)
@@ -47,33 +33,15 @@ def plot_monthly_nousijat(year: int):
     plt.ylabel("Nousijat")
     plt.title(f"Vuoden {year} kuukausittaiset nousijat")
     plt.tight_layout()
-    plt.show()
+    show_or_save(path)
 
-def plot_weekday_nousijat(year: int):
-    rows = get_data(year)
-    if rows is None:
+def plot_weekday_nousijat(year: int, path: str = None, df=None):
+    if df is None:
+        df = get_data(year, ["PÄIVÄ", "NOUSIJAT", "SUUNTA"])
+    if df is None:
         return
 
-    header, data = rows[0], rows[1:]
-    idx_weekday = header.index("PÄIVÄ")
-    idx_passengers = header.index("NOUSIJAT")
-    idx_direction = header.index("SUUNTA")
-
-    weekday_counts = defaultdict(int)
-
-    for row in data:
-        try:
-            weekday = int(row[idx_weekday])
-            passengers = int(row[idx_passengers])
-            direction = row[idx_direction]
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            weekday_counts[weekday] += passengers
-
-    weekdays = range(0, 7)
-    counts = [weekday_counts[d] for d in weekdays]
+    counts = weekday_totals(df)
     weekday_labels = ["Ma", "Ti", "Ke", "To", "Pe", "La", "Su"]
 
     plt.figure(figsize=(10, 6))
@@ -82,33 +50,16 @@ def plot_weekday_nousijat(year: int):
     plt.ylabel("Nousijat")
     plt.title(f"Vuoden {year} nousijat viikonpäivittäin")
     plt.tight_layout()
-    plt.show()
+    show_or_save(path)
 
-def plot_hourly_nousijat(year: int):
-    rows = get_data(year)
-    if rows is None:
+def plot_hourly_nousijat(year: int, path: str = None, df=None):
+    if df is None:
+        df = get_data(year, ["TUNTI", "NOUSIJAT", "SUUNTA"])
+    if df is None:
         return
 
-    header, data = rows[0], rows[1:]
-    idx_hour = header.index("TUNTI")
-    idx_passengers = header.index("NOUSIJAT")
-    idx_direction = header.index("SUUNTA")
-
-    hourly_counts = defaultdict(int)
-
-    for row in data:
-        try:
-            hour = int(row[idx_hour])
-            passengers = int(row[idx_passengers])
-            direction = row[idx_direction]
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            hourly_counts[hour] += passengers
-
     hours = range(0, 24)
-    counts = [hourly_counts[h] for h in hours]
+    counts = hourly_totals(df)
 
     plt.figure(figsize=(12, 6))
     plt.bar(hours, counts)
@@ -117,41 +68,23 @@ def plot_hourly_nousijat(year: int):
     plt.ylabel("Nousijat")
     plt.title(f"Vuoden {year} nousijat tunneittain")
     plt.tight_layout()
-    plt.show()
+    show_or_save(path)
 
-def plot_hourly_nousijat_by_direction(year: int):
-    rows = get_data(year)
-    if rows is None:
+def plot_hourly_nousijat_by_direction(year: int, path: str = None, df=None):
+    if df is None:
+        df = get_data(year, ["TUNTI", "SUUNTA", "NOUSIJAT"])
+    if df is None:
         return
 
-    header, data = rows[0], rows[1:]
-    idx_hour = header.index("TUNTI")
-    idx_direction = header.index("SUUNTA")
-    idx_passengers = header.index("NOUSIJAT")
-
-    counts = defaultdict(lambda: defaultdict(int))
-
-    for row in data:
-        try:
-            hour = int(row[idx_hour])
-            direction = row[idx_direction]
-            passengers = int(row[idx_passengers])
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            counts[hour][direction] += passengers
-
     hours = range(0, 24)
-    directions = sorted({row[idx_direction] for row in data if row[idx_direction] not in ("k1", "k2")})
+    directions, counts = hourly_totals_by_direction(df)
 
     width = 0.8 / len(directions)
     x = np.arange(len(hours))
     plt.figure(figsize=(12, 6))
 
     for i, direction in enumerate(directions):
-        vals = [counts[h][direction] for h in hours]
-        plt.bar(x + i*width, vals, width, label=f"Suunta {direction}")
+        plt.bar(x + i*width, counts[i], width, label=f"Suunta {direction}")
 
     plt.xticks(x + width*(len(directions)-1)/2, hours)
     plt.xlabel("Tunti")
@@ -159,37 +92,15 @@ def plot_hourly_nousijat_by_direction(year: int):
     plt.title(f"Vuoden {year} nousijat tunneittain suunnan mukaan")
     plt.legend()
     plt.tight_layout()
-    plt.show()
-
-def plot_weekly_passengers(year):
-    rows = get_data(year)
+    show_or_save(path)
 
-    if rows is None:
+def plot_weekly_passengers(year, path: str = None, df=None):
+    if df is None:
+        df = get_data(year, ["VIIKKO", "NOUSIJAT", "SUUNTA"])
+    if df is None:
         return
-    
-    header, data = rows[0], rows[1:]
-    idx_year = header.index("VUOSI")
-    idx_week = header.index("VIIKKO")
-    idx_passengers = header.index("NOUSIJAT")
-    idx_direction = header.index("SUUNTA")
 
-    weekly_counts = defaultdict(int)
-
-    for row in data:
-        try:
-            year = int(row[idx_year])
-            week = int(row[idx_week])
-            passengers = int(row[idx_passengers])
-            direction = row[idx_direction]
-        except ValueError:
-            continue
-
-        if direction not in ("k1", "k2"):
-            weekly_counts[week] += passengers
-
-
-    weeks = sorted(weekly_counts.keys())
-    counts = [weekly_counts[w] for w in weeks]
+    weeks, counts = weekly_totals(df)
 
     plt.figure(figsize=(12, 6))
     plt.plot(weeks, counts, marker="o", linewidth=2)
@@ -199,53 +110,42 @@ def plot_weekly_passengers(year):
     plt.title(f"Years {year} passengers per week")
     plt.grid(True, linestyle="--", alpha=0.6)
     plt.tight_layout()
-    plt.show()
+    show_or_save(path)
 
-def plot_average_weekly_passengers(years: list, show_individual=True):
-    all_weekly_counts = []
+def plot_average_weekly_passengers(years: list, show_individual=True, path: str = None):
+    # Years in the database are summed in a single query, the others one by one
+    loaded = [year for year in years if sqlite_store.is_current(year)]
+    rows = dict(zip(*sql_queries.weekly_matrix(sqlite_store.query_totals, loaded))) if loaded else {}
 
     for year in years:
-        rows = get_data(year)
-        if rows is None:
+        if year in loaded:
+            continue
+        df = get_data(year, ["VIIKKO", "NOUSIJAT", "SUUNTA"])
+        if df is None:
             continue
 
-        header, data = rows[0], rows[1:]
-        idx_week = header.index("VIIKKO")
-        idx_passengers = header.index("NOUSIJAT")
-        idx_direction = header.index("SUUNTA")
-
-        weekly_counts = defaultdict(int)
-        for row in data:
-            try:
-                week = int(row[idx_week])
-                passengers = int(row[idx_passengers])
-                direction = row[idx_direction]
-            except ValueError:
-                continue
+        weeks, counts = weekly_totals(df)
+        weekly_counts = np.zeros(54, dtype=np.int64)
+        weekly_counts[weeks] = counts
 
-            if direction not in ("k1", "k2"):
-                weekly_counts[week] += passengers
+        rows[year] = weekly_counts
 
-        all_weekly_counts.append(weekly_counts)
+    found_years = [year for year in years if year in rows]
+    all_weekly_counts = [rows[year] for year in found_years]
 
     if not all_weekly_counts:
         print("No data available for the selected years.")
         return
 
+    # Years x weeks 1-52
     all_weeks = range(1, 53)
-    weekly_sums = defaultdict(list)
-
-    for wc in all_weekly_counts:
-        for week in all_weeks:
-            weekly_sums[week].append(wc.get(week, 0))
-
-    avg_counts = [np.mean(weekly_sums[w]) for w in all_weeks]
+    weekly_matrix = np.vstack(all_weekly_counts)[:, 1:53]
+    avg_counts = weekly_matrix.mean(axis=0)
 
     plt.figure(figsize=(12, 6))
 
     if show_individual:
-        for year, wc in zip(years, all_weekly_counts):
-            counts = [wc.get(w, 0) for w in all_weeks]
+        for year, counts in zip(found_years, weekly_matrix):
             plt.plot(all_weeks, counts, linestyle="--", alpha=0.4, label=f"{year}")
 
     plt.plot(all_weeks, avg_counts, marker="o", linewidth=2, color="black", label="Average")
@@ -257,4 +157,4 @@ def plot_average_weekly_passengers(years: list, show_individual=True):
     plt.legend()
     plt.grid(True, linestyle="--", alpha=0.6)
     plt.tight_layout()
-    plt.show()
+    show_or_save(path)
@@ -5,108 +5,131 @@ import matplotlib.pyplot as plt
 from sklearn.metrics import root_mean_squared_error
 from sklearn.linear_model import LinearRegression
 
-from regression_columns import columns
+from series_cache import daily_series
+from windowing import lag_frame, supervised_windows
+from features import features_for
+from figures import show_or_save
 
-def clean_data(path: str, columns: list):
-    # Clean the raw data
-    try:
-        df = pd.read_csv(path, header=1, index_col=0)
-    except FileNotFoundError:
-        print("Found no raw data from that year")
-        return
+def combine_data_by_date(year: int):
+  return combine_years((year, year))
 
-    # Drop unnecessary columns
-    df = df.drop(df.columns[0], axis=1)
-    df = df.drop(columns=columns)
+# Lag features, optionally with a dataframe of features (e.g. weather) indexed like the series
+def create_lag_features(series, n_lags=3, features=None):
+    frame = lag_frame(series, n_lags)
+    if features is not None:
+        frame = frame.join(features)
+    return frame
 
-    # Replace NaN values with -1
-    df = df.fillna(-1)
-
-    return df
-
-def combine_data_by_date(path):
-  df = clean_data(path, columns)
+# Create input X and output y pairs for our regressor model
+def create_supervised_dataset(series, n_lags, n_forecasts, exog=None, calendar=False):
+  return supervised_windows(series, n_lags, n_forecasts, exog, calendar)
 
-  df["PÄIVÄMÄÄRÄ"] = pd.to_datetime(df["PÄIVÄMÄÄRÄ"])
+# Combine data from multiple years into a single pandas series indexed by date
+def combine_years(years: tuple):
+  timeseries = daily_series(range(years[0], years[1] + 1))
+  timeseries.index = timeseries.index.date
+  timeseries.index.name = "PÄIVÄMÄÄRÄ"
+  return timeseries
 
-  """ 
-  Gets also cumulative passenger count
+def fit_recursive(series, n_lags):
+  # One step ahead model on the n_lags previous values (oldest first)
+  X, y = supervised_windows(series, n_lags, 1)
+  return LinearRegression().fit(X, y[:, 0])
 
-  df = df.set_index("timestamp")
-  df_daily = df.resample("D").sum().reset_index()
+def recursive_forecast(model, history, n_lags, steps):
+  """
+  Forecast steps values ahead by feeding each prediction back in as the newest lag.
+  The lags are kept in a preallocated ring buffer, so a step costs one predict call.
   """
+  buffer = np.array(history[-n_lags:], dtype=float)
+  oldest = 0
+  order = np.arange(n_lags)
+  forecast = np.empty(steps)
 
-  df_daily = df.groupby(df["PÄIVÄMÄÄRÄ"].dt.date)["NOUSIJAT"].sum().reset_index()
-  timeseries = pd.Series(df_daily["NOUSIJAT"].to_list(), index=df_daily["PÄIVÄMÄÄRÄ"])
-  timeseries.name = "NOUSIJAT"
-  return timeseries
+  for step in range(steps):
+    x = buffer[(oldest + order) % n_lags]
+    forecast[step] = model.predict(x.reshape(1, -1))[0]
 
-def create_lag_features(series, n_lags=3):
-    df = pd.DataFrame(series)
-    for lag in range(1, n_lags + 1):
-        df[f"lag_{lag}"] = df[series.name].shift(lag)
-    df.dropna(inplace=True)
-    return df
+    # Overwrite the oldest lag with the prediction
+    buffer[oldest] = forecast[step]
+    oldest = (oldest + 1) % n_lags
 
-# Create input X and output y pairs for our regressor model
-def create_supervised_dataset(series, n_lags, n_forecasts):
-  X, y = [], []
-  for i in range(n_lags, len(series) - n_forecasts + 1):
-    X.append(series[i - n_lags:i].values)
-    y.append(series[i:i + n_forecasts].values)
-  return np.array(X), np.array(y)
-
-# Combine data from multiple years into a single pandas series
-def combine_years(years: tuple):
-  paths = [f"../raw_data_{year}.csv" for year in range(years[0], years[1] + 1)]
-  s = [combine_data_by_date(path) for path in paths]
-  return pd.concat(s)
-
-ts = combine_years((2016, 2023))
-lag_features = create_lag_features(ts, n_lags=5)
-
-# Train / Test split
-split = int(len(lag_features) * 0.8)
-train, test = lag_features.iloc[:split], lag_features.iloc[split:]
-
-X_train, y_train = train.drop(columns=[ts.name]), train[ts.name]
-X_test, y_test = test.drop(columns=[ts.name]), test[ts.name]
-print(X_test)
-
-"""X, y = create_supervised_dataset(ts, n_lags=5, n_forecasts=3)
-
-# Train/test split
-split = int(len(X) * 0.8)
-X_train, X_test, y_train, y_test = X[:split], X[split:], y[:split], y[split:]
-"""
-
-model = LinearRegression()
-model.fit(X_train, y_train)
-
-future_steps = 50
-
-y_pred = model.predict(X_test)
-
-rmse = root_mean_squared_error(y_test, y_pred)
-print('RMSE:', rmse)
-
-events = np.array([np.datetime64('2023-03-25'), 
-                   np.datetime64('2023-12-24'), 
-                   np.datetime64('2023-06-24'), 
-                   np.datetime64('2023-02-21'), 
-                   np.datetime64('2023-06-17'), 
-                   np.datetime64('2023-04-09'), 
-                   np.datetime64('2023-05-01'), 
-                   np.datetime64('2023-08-24'), 
-                   np.datetime64('2023-08-15'), 
-                   np.datetime64('2023-12-31'), 
-                   np.datetime64('2023-11-04')])
-                  
-
-plt.figure(figsize=(20, 10))
-plt.plot(y_test.index, y_test, label="Actual")
-plt.plot(y_test.index, y_pred, label="Predicted")
-for event in events:
-    plt.axvline(event, color='red', linestyle='--', linewidth=2) 
-plt.legend()
-plt.show()
+  return forecast
+
+def fit_direct(series, n_lags, steps):
+  """
+  One linear model per horizon 1..steps, all solved in a single least squares call.
+  Returns a (n_lags + 1) x steps coefficient matrix, the first row being the intercepts.
+  """
+  X, y = supervised_windows(series, n_lags, steps)
+  X = np.hstack([np.ones((len(X), 1)), X])
+  coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+  return coef
+
+def direct_forecast(coef, history):
+  n_lags = coef.shape[0] - 1
+  x = np.concatenate([[1.0], np.asarray(history, dtype=float)[-n_lags:]])
+  return x @ coef
+
+def multi_step_forecast(series, n_lags, steps, mode="recursive"):
+  # Forecast the days after the end of a daily series either recursively or directly
+  if mode == "direct":
+    forecast = direct_forecast(fit_direct(series, n_lags, steps), series.values)
+  else:
+    forecast = recursive_forecast(fit_recursive(series, n_lags), series.values, n_lags, steps)
+
+  start = pd.to_datetime(series.index[-1]) + pd.Timedelta(days=1)
+  return pd.Series(forecast, index=pd.date_range(start, periods=steps, freq="D"), name=series.name)
+
+def plot_predictions(y_test, y_pred, events=(), path=None):
+  # Actual and predicted passengers with the given event days marked
+  plt.figure(figsize=(20, 10))
+  plt.plot(y_test.index, y_test, label="Actual")
+  plt.plot(y_test.index, y_pred, label="Predicted")
+  for event in events:
+      plt.axvline(event, color='red', linestyle='--', linewidth=2)
+  plt.legend()
+  show_or_save(path)
+
+if __name__ == "__main__":
+    ts = combine_years((2016, 2023))
+    features = features_for(ts.index, "D")
+    lag_features = create_lag_features(ts, n_lags=5, features=features)
+
+    # Train / Test split
+    split = int(len(lag_features) * 0.8)
+    train, test = lag_features.iloc[:split], lag_features.iloc[split:]
+
+    X_train, y_train = train.drop(columns=[ts.name]), train[ts.name]
+    X_test, y_test = test.drop(columns=[ts.name]), test[ts.name]
+    print(X_test)
+
+    """X, y = create_supervised_dataset(ts, n_lags=5, n_forecasts=3)
+
+    # Train/test split
+    split = int(len(X) * 0.8)
+    X_train, X_test, y_train, y_test = X[:split], X[split:], y[:split], y[split:]
+    """
+
+    model = LinearRegression()
+    model.fit(X_train, y_train)
+
+    future_steps = 50
+
+    y_pred = model.predict(X_test)
+
+    rmse = root_mean_squared_error(y_test, y_pred)
+    print('RMSE:', rmse)
+
+    # Forecast future_steps days after the training data without seeing the test data
+    history = ts.iloc[:split + 5]
+    for mode in ("recursive", "direct"):
+      forecast = multi_step_forecast(history, 5, future_steps, mode)
+      rmse = root_mean_squared_error(y_test[:future_steps], forecast[:len(y_test)])
+      print(f'{future_steps} day {mode} RMSE:', rmse)
+
+    # Days with an event during the test period
+    events = features.index[features["TAPAHTUMA"] == 1]
+    events = [event for event in events if event >= y_test.index[0]]
+
+    plot_predictions(y_test, y_pred, events)
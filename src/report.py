@@ -0,0 +1,101 @@
+import os
+import argparse
+import matplotlib
+
+# Render without a display. Must be selected before pyplot is imported by the plotting modules.
+matplotlib.use("Agg")
+
+from storage import parsed_years
+from data_access import year_data
+from parallel_search import parallel_map
+from plot_functions import (
+    plot_monthly_nousijat,
+    plot_weekday_nousijat,
+    plot_hourly_nousijat,
+    plot_hourly_nousijat_by_direction,
+    plot_weekly_passengers,
+    plot_average_weekly_passengers
+)
+from line_diagrams import (
+    line_diagram_monthly_nousijat,
+    line_diagram_weekly_nousijat,
+    line_diagram_hourly_nousijat
+)
+
+REPORT_DIR = "../reports"
+
+# Charts drawn for every year: name -> function(year, path, df)
+YEAR_CHARTS = {
+    "monthly": plot_monthly_nousijat,
+    "weekday": plot_weekday_nousijat,
+    "hourly": plot_hourly_nousijat,
+    "hourly_by_direction": plot_hourly_nousijat_by_direction,
+    "weekly": plot_weekly_passengers,
+}
+
+def average_weekly(years, path):
+    plot_average_weekly_passengers(years, path=path)
+
+# Charts comparing the years: name -> function(years, path)
+SUMMARY_CHARTS = {
+    "average_weekly": average_weekly,
+    "line_monthly": line_diagram_monthly_nousijat,
+    "line_weekly": line_diagram_weekly_nousijat,
+    "line_hourly": line_diagram_hourly_nousijat,
+}
+
+def render_year(year, charts, out_dir, fmt):
+    # Draw the charts of one year. The rollup cube is read once and shared by all of them.
+    df = year_data(year)
+    if df is None:
+        return {"files": []}
+
+    files = []
+    for name in charts:
+        path = f"{out_dir}/{name}_{year}.{fmt}"
+        YEAR_CHARTS[name](year, path, df)
+        files.append(path)
+    return {"files": files}
+
+def render_summary(name, years, out_dir, fmt):
+    path = f"{out_dir}/{name}_{min(years)}-{max(years)}.{fmt}"
+    SUMMARY_CHARTS[name](years, path)
+    return {"files": [path]}
+
+def render(fn, args):
+    return fn(*args)
+
+def batch_report(years, charts=None, summaries=None, out_dir: str = REPORT_DIR,
+                 fmt: str = "png", workers: int = None):
+    """
+    Save the charts of every year and the summary charts of all the years to
+    out_dir as PNG or SVG files. The charts of a year are drawn by one worker
+    from one read of its data, and the years and summaries are split over a
+    process pool. Returns the paths of the saved files.
+    """
+    charts = charts or list(YEAR_CHARTS)
+    summaries = summaries if summaries is not None else list(SUMMARY_CHARTS)
+    os.makedirs(out_dir, exist_ok=True)
+
+    tasks = [(render_year, (year, charts, out_dir, fmt)) for year in years]
+    tasks += [(render_summary, (name, list(years), out_dir, fmt)) for name in summaries]
+    results = parallel_map(render, tasks, workers)
+
+    files = []
+    for (fn, args), result in zip(tasks, results):
+        if result["status"] != "ok":
+            print(f"Rendering {args[0]} failed: {result['status']}")
+            continue
+        files.extend(result["files"])
+    return files
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Save the passenger charts without showing them")
+    parser.add_argument("years", nargs="*", type=int, help="years to draw (default: all parsed years)")
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    parser.add_argument("--out", default=REPORT_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    files = batch_report(args.years or parsed_years(), out_dir=args.out, fmt=args.format, workers=args.workers)
+    print(f"Saved {len(files)} charts to {args.out}")
@@ -6,6 +6,11 @@ import matplotlib.dates as mdates
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 from scipy.optimize import OptimizeWarning
+from series_cache import monthly_series
+from parallel_search import parallel_map, halving_search, run_task
+from model_cache import fit_cached
+from features import features_for
+from figures import show_or_save
 
 warnings.filterwarnings("ignore", category=UserWarning, module="statsmodels")
 warnings.filterwarnings("ignore", category=OptimizeWarning)
@@ -15,19 +20,122 @@ def get_data(year):
     Create a dataframe with entries like:
     Month name : Total passengers per month
     """
-    path = f"../parsed_data_{year}.csv"
+    monthly = monthly_series([year], ["s1", "s2"])
+    if monthly is None:
+        return None
 
-    df = pd.read_csv(path)
-    df = df[df["SUUNTA"].isin(["s1", "s2"])][["PÄIVÄMÄÄRÄ", "NOUSIJAT"]]
-    df["PÄIVÄMÄÄRÄ"] = pd.to_datetime(df["PÄIVÄMÄÄRÄ"])
-    df = df.set_index("PÄIVÄMÄÄRÄ")
-
-    monthly_df = df.resample("ME").sum().reset_index()[:12]
+    monthly_df = monthly.rename_axis("PÄIVÄMÄÄRÄ").reset_index()[:12]
 
     return monthly_df
 
-def optimize_sarimax(df, actual):
-    # Find optimal parameters for the SARIMAX model
+def warm_start_params(model, params):
+    # Start from the model's default start parameters, replacing those that the
+    # already fitted params (a Series indexed by parameter name) also have
+    start = model.start_params.copy()
+    for i, name in enumerate(model.param_names):
+        if name in params.index:
+            start[i] = params[name]
+    return start
+
+def fit_candidate(series, actual, method, order, seasonal_order, maxiter=50, start=None):
+    # Fit one SARIMAX candidate and measure its 12 month forecast against the actual data
+    model = SARIMAX(series, order=order, seasonal_order=seasonal_order)
+    start_params = None if start is None else warm_start_params(model, start)
+    results = model.fit(start_params=start_params, method=method, maxiter=maxiter, disp=False)
+
+    fc = results.forecast(steps=12)
+    fc = fc.round().astype(int)
+
+    # Mean absolute error of the forecast
+    error = mean_absolute_error(actual, fc)
+
+    # Ratio of the MAE and the actual mean of the data
+    ratio = error / actual.mean()
+
+    return {
+        "error": error,
+        "ratio": ratio,
+        "aic": results.aic,
+        "converged": bool(results.mle_retvals.get("converged", False)),
+        # Not every optimizer reports its iterations, but all of them count their
+        # function and gradient evaluations, which are comparable across methods
+        "evaluations": results.mle_retvals.get("fcalls", 0) + results.mle_retvals.get("gcalls", 0),
+        "fcalls": results.mle_retvals.get("fcalls"),
+        "params": results.params
+    }
+
+def order_distance(a, b):
+    # Distance between two orders. A different d changes the meaning of the
+    # parameters the most, so it weighs more than p and q.
+    return abs(a[0] - b[0]) + 4*abs(a[1] - b[1]) + abs(a[2] - b[2])
+
+def fit_chain(series, actual, seasonal_order, orders, methods, warm_start, timeout):
+    """
+    Fit a chain of candidates with the same seasonal order one after another.
+    With warm_start, the first method of each order starts from the parameters
+    of the closest order fitted so far, and the other methods start from the
+    parameters of the first method whose optimizer converged. Orders where no
+    method converged are not used as a starting point.
+    """
+    fitted = []
+    fits = []
+
+    for order in orders:
+        start = None
+        if warm_start and fitted:
+            start = min(fitted, key=lambda f: order_distance(f[0], order))[1]
+
+        converged = False
+        for method in methods:
+            task = (series, actual, method, order, seasonal_order, 50, start)
+            result = run_task(fit_candidate, timeout, task)
+            params = result.pop("params", None)
+
+            fits.append({"method": method, "ord": order, "seasonal_ord": seasonal_order,
+                         "warm": start is not None, **result})
+
+            if warm_start and result.get("converged") and not converged:
+                fitted.append((order, params))
+                start = params
+                converged = True
+
+    return {"fits": fits}
+
+def sarimax_neighbours(candidate):
+    # Candidates that differ from the given one by one step in a single order term
+    method, order, seasonal_order = candidate
+    terms = list(order) + list(seasonal_order[:3])
+    limits = [3, 3, 3, 1, 1, 1]
+
+    for i in range(len(terms)):
+        for step in (-1, 1):
+            new = terms.copy()
+            new[i] += step
+            if 0 <= new[i] <= limits[i]:
+                yield (method, tuple(new[:3]), (*new[3:], seasonal_order[3]))
+
+def optimize_sarimax(df, actual, workers: int = None, timeout: float = 120,
+                     search: str = "grid", keep: float = 0.1, stepwise: bool = True,
+                     warm_start: bool = True, chain_length: int = 16):
+    """
+    Find optimal parameters for the SARIMAX model.
+    Every combination of method, order and seasonal order is fitted in a
+    process pool of `workers` processes, each fit getting at most `timeout`
+    seconds. Returns all the candidates ranked by the forecast error.
+
+    With search="halving" all candidates are first fitted with a few optimizer
+    iterations and only the `keep` fraction with the lowest AIC is fitted
+    fully, followed by a stepwise search around the best order if stepwise is set.
+
+    With the grid search and warm_start, candidates sharing a seasonal order
+    and d are fitted as chains of at most `chain_length` orders in one worker,
+    each fit starting from the parameters of the closest model fitted before
+    it (see fit_chain). There are 16 orders per seasonal order and d, so the
+    default gives 32 chains and no more than 32 workers are kept busy. A
+    shorter chain_length splits the grid over more workers at the cost of
+    fewer warm starts. The converged, evaluations and fcalls columns show the
+    optimizer work of every fit.
+    """
 
     p = d = q = range(0, 4)
     P = D = Q = range(0, 2)
@@ -44,49 +152,47 @@ def optimize_sarimax(df, actual):
                     for seasonal_order in seasonal_pdq]
     methods = ["bfgs", "lbfgs", "powell", "cg"]
 
-    param_results = []
-    min_error = 10**6    
-
-    for method in methods:
-        for i, (order, seasonal_order) in enumerate(combinations):
-            model = SARIMAX(df["NOUSIJAT"], order=order, seasonal_order=seasonal_order)
-
-            try:
-                results = model.fit(method=method)
-            except Exception as e:
-                print(f"Fit failed with method {method} and {order}, {seasonal_order}")
-                print(f"\nError: {e}")
-
-            fc = results.forecast(steps=12)
-            fc = fc.round().astype(int)
-
-            # Mean absolute error of the forecast
-            error = mean_absolute_error(actual["NOUSIJAT"], fc)
-
-            # Ratio of the MAE and the actual mean of the data
-            ratio = error / actual["NOUSIJAT"].mean()
-
-            if error < min_error:
-                param_results.append(
-                    {  
-                        "method": method,
-                        "ord": order,
-                        "seasonal_ord": seasonal_order,
-                        "error": error,
-                        "ratio": ratio
-                    }
-                )
-                min_error = error
-
-            # Print the status of the optimization
-            print(f"{i}/{len(combinations)} with {method}: {order}, {seasonal_order} -> {error}")
-
-    return param_results
-    
-
-
-def sarimax_forecast(df):
-    # Forecasting with SARIMA model
+    candidates = [(method, order, seasonal_order)
+                  for method in methods
+                  for order, seasonal_order in combinations]
+    data = (df["NOUSIJAT"], actual["NOUSIJAT"].to_numpy())
+
+    if search == "halving":
+        print(f"Screening {len(candidates)} models...")
+        fits = halving_search(fit_candidate, data, candidates, keep=keep,
+                              screen_key="aic", score_key="error",
+                              neighbours=sarimax_neighbours if stepwise else None,
+                              workers=workers, timeout=timeout)
+
+        # Only the fully fitted candidates are ranked
+        fits = [f for f in fits if f["stage"] != "screen"]
+        candidates = [f.pop("candidate") for f in fits]
+        param_results = pd.DataFrame([
+            {"method": method, "ord": order, "seasonal_ord": seasonal_order, **result}
+            for (method, order, seasonal_order), result in zip(candidates, fits)
+        ])
+    else:
+        print(f"Fitting {len(candidates)} models...")
+
+        # Chains per seasonal order and d, so that neighbouring orders are fitted in the same worker
+        tasks = []
+        for seasonal_order in seasonal_pdq:
+            for d_ in d:
+                orders = [o for o in pdq if o[1] == d_]
+                for i in range(0, len(orders), chain_length):
+                    tasks.append((*data, seasonal_order, orders[i:i + chain_length], methods, warm_start, timeout))
+        chains = parallel_map(fit_chain, tasks, workers)
+        param_results = pd.DataFrame([fit for chain in chains for fit in chain["fits"]])
+
+    param_results = param_results.drop(columns="params", errors="ignore")
+
+    # Stable sort keeps the ranking deterministic for equal errors, failed fits go last
+    param_results = param_results.sort_values("error", kind="stable", na_position="last")
+    return param_results.reset_index(drop=True)
+
+def sarimax_forecast(df, exog=None, future_exog=None, path: str = None):
+    # Forecasting with SARIMA model. Weather and event features can be given as
+    # exog for the observed months and future_exog for the forecast months.
 
     df_now = get_data(2025)
 
@@ -97,13 +203,14 @@ def sarimax_forecast(df):
     p, d, q = 3, 1, 3
     P, D, Q, s = 1, 1, 0, 12
 
-    # Fit the model
-    model = SARIMAX(df["NOUSIJAT"], order=(p, d, q), seasonal_order=(P, D, Q, s))
-    results = model.fit(method="bfgs")
+    # Fit the model, or load it from the cache if the data has not changed
+    results = fit_cached(SARIMAX, df["NOUSIJAT"],
+                         {"order": (p, d, q), "seasonal_order": (P, D, Q, s), "exog": exog},
+                         {"method": "bfgs"})
 
     # Forecast periods for monthly data is 12
     forecast_periods = 12
-    forecast = results.forecast(steps=forecast_periods)
+    forecast = results.forecast(steps=forecast_periods, exog=future_exog)
     
     # Plot the observed data and the forecast
     plt.figure(figsize=(12, 5))
@@ -122,7 +229,7 @@ def sarimax_forecast(df):
 
     plt.legend()
     plt.grid(True)
-    plt.show()
+    show_or_save(path)
 
 if __name__ == "__main__":
     # Data for forecasting
@@ -144,5 +251,10 @@ if __name__ == "__main__":
     #print(optimize_sarimax(dfss, df24))
     sarimax_forecast(dfs)
 
+    # Same forecast with the monthly weather and the number of event and holiday days
+    columns = ["LÄMPÖTILA_PÄIVÄ", "SADE_PÄIVÄ", "TAPAHTUMA", "LOMA"]
+    future = pd.date_range(dfs.index[-1], periods=13, freq="ME")[1:]
+    sarimax_forecast(dfs, features_for(dfs.index, "ME", columns), features_for(future, "ME", columns))
+
 
 
@@ -0,0 +1,133 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from storage import parsed_stamp
+from data_access import year_data
+
+# Hourly passengers of each year and direction as raw int32 arrays,
+# ../series_cache/2024_s1.bin, with a header ../series_cache/2024.json telling
+# the first date, the number of hours and the directions of the year.
+# Hour h of the array is start + h hours, so a date range maps to a slice.
+SERIES_DIR = "../series_cache"
+DTYPE = "int32"
+
+def header_path(year: int):
+    return f"{SERIES_DIR}/{year}.json"
+
+def array_path(year: int, direction: str):
+    return f"{SERIES_DIR}/{year}_{direction}.bin"
+
+def read_header(year: int):
+    try:
+        with open(header_path(year), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def build_year(year: int):
+    """
+    Write the hourly arrays of a year from its rollup cube. The arrays run from
+    the first to the last date with data, hours without passengers being 0.
+    """
+    df = year_data(year, ["PÄIVÄMÄÄRÄ", "TUNTI", "SUUNTA", "NOUSIJAT"])
+    if df is None:
+        return None
+    df = df[df["PÄIVÄMÄÄRÄ"].notna() & df["TUNTI"].between(0, 23)]
+
+    start = df["PÄIVÄMÄÄRÄ"].min()
+    days = (df["PÄIVÄMÄÄRÄ"].max() - start).days + 1
+    offsets = (df["PÄIVÄMÄÄRÄ"] - start).dt.days.to_numpy() * 24 + df["TUNTI"].to_numpy()
+
+    directions = df["SUUNTA"].astype(str).to_numpy()
+    names = sorted(set(directions))
+
+    os.makedirs(SERIES_DIR, exist_ok=True)
+    for name in names:
+        mask = directions == name
+        counts = np.bincount(offsets[mask], weights=df["NOUSIJAT"].to_numpy()[mask], minlength=days * 24)
+        counts.astype(DTYPE).tofile(f"{array_path(year, name)}.{os.getpid()}.part")
+        os.replace(f"{array_path(year, name)}.{os.getpid()}.part", array_path(year, name))
+
+    header = {
+        "start": start.strftime("%Y-%m-%d"),
+        "hours": days * 24,
+        "directions": names,
+        "parsed": parsed_stamp(year)
+    }
+    with open(f"{header_path(year)}.{os.getpid()}.part", "w", encoding="utf-8") as f:
+        json.dump(header, f)
+    os.replace(f"{header_path(year)}.{os.getpid()}.part", header_path(year))
+
+    return header
+
+def year_header(year: int):
+    # Header of a year, building the arrays first if they are missing or older than the parsed data
+    header = read_header(year)
+    if header is None or header["parsed"] != parsed_stamp(year):
+        header = build_year(year)
+    return header
+
+def hourly_array(year: int, direction: str, header: dict):
+    # Zero-copy view of the hourly passengers of a direction
+    if direction not in header["directions"]:
+        return None
+    return np.memmap(array_path(year, direction), dtype=DTYPE, mode="r", shape=(header["hours"],))
+
+def year_hours(year: int, directions=None, start=None, end=None):
+    """
+    Hourly passengers of a year between the start and end dates (both included)
+    summed over the given directions (all by default). The date range is turned
+    into a slice of the memory-mapped arrays, so only that range is read.
+    Returns the first hour of the range and a 1-d array of passengers per hour.
+    """
+    header = year_header(year)
+    if header is None:
+        return None, None
+
+    first = pd.Timestamp(header["start"])
+    lo = 0 if start is None else max(0, (pd.Timestamp(start) - first).days * 24)
+    hi = header["hours"] if end is None else min(header["hours"], ((pd.Timestamp(end) - first).days + 1) * 24)
+    if lo >= hi:
+        return None, None
+
+    directions = header["directions"] if directions is None else directions
+    total = np.zeros(hi - lo, dtype=np.int64)
+    for direction in directions:
+        hours = hourly_array(year, direction, header)
+        if hours is not None:
+            total += hours[lo:hi]
+
+    return first + pd.Timedelta(hours=lo), total
+
+def hourly_series(years, directions=None, start=None, end=None):
+    # Passengers per hour between the start and end dates in the given years
+    parts = []
+    for year in years:
+        first, hours = year_hours(year, directions, start, end)
+        if first is not None:
+            parts.append(pd.Series(hours, index=pd.date_range(first, periods=len(hours), freq="h")))
+
+    if not parts:
+        return None
+    return pd.concat(parts).rename("NOUSIJAT")
+
+def daily_series(years, directions=None):
+    # Passengers per day, one reshape and sum per year
+    parts = []
+    for year in years:
+        first, hours = year_hours(year, directions)
+        if first is None:
+            continue
+        days = hours.reshape(-1, 24).sum(axis=1)
+        parts.append(pd.Series(days, index=pd.date_range(first, periods=len(days), freq="D")))
+
+    if not parts:
+        return None
+    return pd.concat(parts).rename("NOUSIJAT")
+
+def monthly_series(years, directions=None):
+    daily = daily_series(years, directions)
+    if daily is None:
+        return None
+    return daily.resample("ME").sum()
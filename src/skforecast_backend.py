@@ -0,0 +1,53 @@
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from skforecast.recursive import ForecasterRecursive
+from skforecast.direct import ForecasterDirect
+from skforecast.model_selection import backtesting_forecaster, grid_search_forecaster, TimeSeriesFold
+
+def as_frequency(series, freq: str = "D"):
+    # skforecast needs a DatetimeIndex with a frequency, e.g. for the daily series of regressor.py
+    series = series.copy()
+    series.index = pd.DatetimeIndex(pd.to_datetime(series.index))
+    return series.asfreq(freq, fill_value=0).astype(float)
+
+def create_forecaster(kind: str = "recursive", lags=14, steps: int = None, regressor=None):
+    """
+    A recursive forecaster predicts one step and feeds it back as a lag, a direct
+    forecaster fits one model for each of the `steps` horizons.
+    """
+    regressor = regressor or LinearRegression()
+    if kind == "direct":
+        return ForecasterDirect(regressor=regressor, steps=steps, lags=lags)
+    return ForecasterRecursive(regressor=regressor, lags=lags)
+
+def skforecast_forecast(series, horizon: int, lags=14, kind: str = "recursive", regressor=None, exog=None, future_exog=None):
+    """
+    Fit a forecaster on the whole series and forecast horizon steps ahead with
+    a 95% bootstrapped interval. Returns a dataframe with the columns forecast,
+    lower and upper.
+    """
+    forecaster = create_forecaster(kind, lags, horizon, regressor)
+    forecaster.fit(y=series, exog=exog, store_in_sample_residuals=True)
+
+    fc = forecaster.predict_interval(steps=horizon, exog=future_exog, interval=[2.5, 97.5])
+    fc.columns = ["forecast", "lower", "upper"]
+    return fc
+
+def skforecast_backtest(series, horizon: int, initial_train_size: int, lags=14, kind: str = "recursive",
+                        regressor=None, refit=False, metric: str = "mean_absolute_error", n_jobs="auto"):
+    # Backtest a forecaster over folds of horizon steps after initial_train_size observations
+    forecaster = create_forecaster(kind, lags, horizon, regressor)
+    cv = TimeSeriesFold(steps=horizon, initial_train_size=initial_train_size, refit=refit, verbose=False)
+
+    return backtesting_forecaster(forecaster, y=series, cv=cv, metric=metric,
+                                  n_jobs=n_jobs, show_progress=False)
+
+def skforecast_grid_search(series, horizon: int, initial_train_size: int, lags_grid, param_grid: dict = None,
+                           kind: str = "recursive", regressor=None, metric: str = "mean_absolute_error", n_jobs="auto"):
+    # Search the lags and regressor parameters. Returns the results ranked by the metric.
+    forecaster = create_forecaster(kind, lags_grid[0], horizon, regressor)
+    cv = TimeSeriesFold(steps=horizon, initial_train_size=initial_train_size, refit=False, verbose=False)
+
+    return grid_search_forecaster(forecaster, y=series, cv=cv, param_grid=param_grid or {},
+                                  lags_grid=lags_grid, metric=metric, return_best=False,
+                                  n_jobs=n_jobs, show_progress=False)
@@ -0,0 +1,75 @@
+import pandas as pd
+from storage import CATEGORY_COLUMNS
+from aggregations import EXCLUDED_DIRECTIONS
+
+# SQL shared by the database backends, sqlite_store.py and database.py. The
+# backends only connect and load rows, and run the queries built here.
+TABLE = "passengers"
+
+# Stored columns and their types. The names are the same as in the parsed data
+# and the types are understood by both SQLite and PostgreSQL.
+TABLE_COLUMNS = {
+    "PÄIVÄMÄÄRÄ": "date",
+    "VUOSI": "smallint",
+    "KUUKAUSI": "smallint",
+    "VIIKKO": "smallint",
+    "PÄIVÄ": "smallint",
+    "TUNTI": "smallint",
+    "SUUNTA": "text",
+    "PYSÄKKI": "text",
+    "ALUS": "text",
+    "NOUSIJAT": "integer",
+}
+
+def quote(column: str):
+    return f'"{column}"'
+
+def create_table_sql():
+    columns = ", ".join(f"{quote(col)} {sql_type}" for col, sql_type in TABLE_COLUMNS.items())
+    return f"CREATE TABLE IF NOT EXISTS {TABLE} ({columns})"
+
+def table_rows(df):
+    # The parsed rows of df in the column order of the table, dates as YYYY-MM-DD and text as str
+    df = df[list(TABLE_COLUMNS)].copy()
+    df["PÄIVÄMÄÄRÄ"] = df["PÄIVÄMÄÄRÄ"].dt.strftime("%Y-%m-%d")
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype(str)
+    return df
+
+def totals_sql(years, columns: list, passengers_only: bool, placeholder: str):
+    """
+    Query of the passenger sums of the given years grouped by the given columns.
+    With passengers_only the excluded directions are left out as in
+    aggregations.passenger_mask. placeholder is the parameter marker of the
+    driver, "?" for sqlite3 and "%s" for psycopg2. Returns the query and its parameters.
+    """
+    years = [int(y) for y in years]
+    keys = ", ".join(quote(col) for col in columns)
+
+    def markers(n):
+        return ", ".join([placeholder] * n)
+
+    # An empty IN list is not valid in PostgreSQL
+    where = [f'"VUOSI" IN ({markers(len(years))})' if years else "1 = 0", '"NOUSIJAT" >= 0']
+    params = [*years]
+    if passengers_only:
+        where.append(f'"SUUNTA" NOT IN ({markers(len(EXCLUDED_DIRECTIONS))})')
+        params.extend(EXCLUDED_DIRECTIONS)
+
+    sql = (f'SELECT {keys}, CAST(SUM("NOUSIJAT") AS bigint) AS "NOUSIJAT" FROM {TABLE} '
+           f'WHERE {" AND ".join(where)} GROUP BY {keys} ORDER BY {keys}')
+    return sql, params
+
+def weekly_matrix(query_totals, years):
+    """
+    Weekly passengers of the given years from a single query of a backend's
+    query_totals, e.g. weekly_matrix(sqlite_store.query_totals, [2023, 2024])
+    Returns the years found and a (years x 54) array indexed by week number.
+    """
+    df = query_totals(years, ["VUOSI", "VIIKKO"])
+    df = df[df["VIIKKO"].between(0, 53)]
+
+    found = sorted(df["VUOSI"].unique())
+    matrix = pd.crosstab(df["VUOSI"], df["VIIKKO"], values=df["NOUSIJAT"], aggfunc="sum")
+    matrix = matrix.reindex(index=found, columns=range(54), fill_value=0).fillna(0)
+    return [int(y) for y in found], matrix.to_numpy(dtype="int64")
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+from contextlib import closing
+import pandas as pd
+from storage import read_parsed, parsed_years, parsed_stamp
+from sql_queries import TABLE, TABLE_COLUMNS, quote, create_table_sql, table_rows, totals_sql
+
+# Embedded database holding the parsed rows of all years in a single file.
+# Needs nothing but the standard library, unlike the PostgreSQL backend in database.py.
+# The queries are shared with it in sql_queries.py.
+DB_PATH = "../passengers.db"
+
+INDEXED_COLUMNS = ["VUOSI", "PÄIVÄMÄÄRÄ", "TUNTI", "SUUNTA"]
+
+def connect(path: str = DB_PATH):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    create_tables(conn)
+    return conn
+
+def create_tables(conn):
+    with conn:
+        conn.execute(create_table_sql())
+        for col in INDEXED_COLUMNS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_{col} ON {TABLE} ({quote(col)})")
+
+        # One row per loaded year with the stamp of the parsed files it was loaded from
+        conn.execute('CREATE TABLE IF NOT EXISTS years ("VUOSI" INTEGER PRIMARY KEY, rows INTEGER, parsed TEXT)')
+
+def load_year(df, year: int, path: str = DB_PATH):
+    # Replace the rows of a year with the parsed rows in df in a single transaction
+    df = table_rows(df)
+    columns = ", ".join(quote(col) for col in TABLE_COLUMNS)
+    placeholders = ", ".join("?" * len(TABLE_COLUMNS))
+
+    with closing(connect(path)) as conn, conn:
+        conn.execute(f'DELETE FROM {TABLE} WHERE "VUOSI" = ?', (year,))
+        conn.executemany(f"INSERT INTO {TABLE} ({columns}) VALUES ({placeholders})",
+                         df.itertuples(index=False, name=None))
+        conn.execute("INSERT OR REPLACE INTO years VALUES (?, ?, ?)", (year, len(df), parsed_stamp(year)))
+
+def is_current(year: int, path: str = DB_PATH):
+    # True if the year has been loaded from its current parsed files
+    if not os.path.exists(path):
+        return False
+    with closing(connect(path)) as conn:
+        row = conn.execute('SELECT parsed FROM years WHERE "VUOSI" = ?', (year,)).fetchone()
+    return row is not None and row[0] == parsed_stamp(year)
+
+def sync_parsed(path: str = DB_PATH):
+    # Load the parsed years that are missing from the database or have been cleaned again since
+    for year in parsed_years():
+        if not is_current(year, path):
+            df = read_parsed([year], list(TABLE_COLUMNS))
+            if df is not None:
+                load_year(df, year, path)
+    return stored_years(path)
+
+def stored_years(path: str = DB_PATH):
+    # Years in the database, read from the metadata table instead of the rows
+    with closing(connect(path)) as conn:
+        return [row[0] for row in conn.execute('SELECT "VUOSI" FROM years ORDER BY 1')]
+
+def query_totals(years, columns: list, passengers_only: bool = True, path: str = DB_PATH):
+    """
+    Passenger sums of the given years grouped by the given columns in one
+    indexed query.
+    """
+    sql, params = totals_sql(years, columns, passengers_only, "?")
+    with closing(connect(path)) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+if __name__ == "__main__":
+    years = sync_parsed()
+    print(query_totals(years, ["VUOSI", "KUUKAUSI"]))
@@ -0,0 +1,228 @@
+import glob
+import json
+import os
+import pandas as pd
+from aggregations import build_cube
+
+# Parsed data is stored as parquet files partitioned by year (and optionally month):
+# ../parsed_data/VUOSI=2024/KUUKAUSI=01.parquet
+# The rollup cube of each year is stored next to it as ../parsed_data/rollup_2024.parquet
+PARSED_DIR = "../parsed_data"
+
+DATE_COLUMN = "PÄIVÄMÄÄRÄ"
+INT_COLUMNS = {
+    "VUOSI": "int16",
+    "KUUKAUSI": "int8",
+    "VIIKKO": "int8",
+    "PÄIVÄ": "int8",
+    "TUNTI": "int8",
+    "NOUSIJAT": "int32",
+}
+
+# Text columns are stored as small integer codes. The labels of the codes are kept in
+# ../parsed_data/dictionary.json and new labels are only appended, so a code means the
+# same label in every year.
+CATEGORY_COLUMNS = ["ALUS", "SUUNTA", "PYSÄKKI"]
+DICTIONARY_PATH = f"{PARSED_DIR}/dictionary.json"
+
+def year_dir(year: int):
+    return f"{PARSED_DIR}/VUOSI={year}"
+
+def load_dictionary():
+    try:
+        with open(DICTIONARY_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_dictionary(dictionary: dict):
+    os.makedirs(PARSED_DIR, exist_ok=True)
+    with open(f"{DICTIONARY_PATH}.part", "w", encoding="utf-8") as f:
+        json.dump(dictionary, f, ensure_ascii=False)
+    os.replace(f"{DICTIONARY_PATH}.part", DICTIONARY_PATH)
+
+def column_labels(column):
+    # The distinct labels of a text column, whether it is categorical or plain strings
+    values = column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else column.dropna().unique()
+    return set(map(str, values))
+
+def set_categories(df, dictionary: dict = None):
+    """
+    Give the text columns the labels of the stored dictionary as categories.
+    Frames with the same categories keep their codes when concatenated, and
+    files written before a label was added get the longer list of labels.
+    """
+    dictionary = load_dictionary() if dictionary is None else dictionary
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            continue
+        labels = list(dictionary.get(col, []))
+        labels += sorted(column_labels(df[col]) - set(labels))
+
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.set_categories(labels)
+        else:
+            df[col] = pd.Categorical(df[col], categories=labels)
+    return df
+
+def concat_frames(frames: list):
+    """
+    Concatenate frames read from separate files with the same categories in
+    each of them. Labels missing from the stored dictionary, e.g. those of
+    files written before it as plain strings, are added for all the frames
+    before any of them is encoded, so the result stays categorical.
+    """
+    dictionary = load_dictionary()
+    for col in CATEGORY_COLUMNS:
+        labels = list(dictionary.get(col, []))
+        found = set().union(*(column_labels(df[col]) for df in frames if col in df.columns))
+        dictionary[col] = labels + sorted(found - set(labels))
+
+    # Shallow copies, as the frames may be shared, e.g. the cubes cached by data_access
+    return pd.concat([set_categories(df.copy(deep=False), dictionary) for df in frames], ignore_index=True)
+
+def set_types(df):
+    # Give the cleaned columns proper types. Missing values are replaced with -1.
+    df = df.copy()
+    dictionary = load_dictionary()
+
+    if DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], errors="coerce")
+
+    for col in df.columns:
+        if col == DATE_COLUMN:
+            continue
+        if col in INT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(-1).astype(INT_COLUMNS[col])
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].fillna(-1).astype(str)
+            labels = dictionary.setdefault(col, [])
+            labels += sorted(set(df[col].unique()) - set(labels))
+        elif df[col].dtype == object:
+            df[col] = df[col].fillna(-1).astype(str)
+        elif df[col].dtype.kind == "f":
+            df[col] = df[col].fillna(-1).astype("float32")
+        else:
+            df[col] = df[col].fillna(-1)
+
+    save_dictionary(dictionary)
+    return set_categories(df, dictionary)
+
+def write_parsed(df, year: int, by_month: bool = False):
+    # Write the parsed data of a year, replacing any earlier files of that year
+    path = year_dir(year)
+    os.makedirs(path, exist_ok=True)
+    for old in glob.glob(f"{path}/*.parquet"):
+        os.remove(old)
+
+    if not by_month:
+        df.to_parquet(f"{path}/data.parquet", index=False)
+        return
+
+    for month, month_df in df.groupby("KUUKAUSI"):
+        month_df.to_parquet(f"{path}/KUUKAUSI={month:02d}.parquet", index=False)
+
+def parsed_years():
+    # Return the years for which parsed data is available
+    years = []
+    for path in glob.glob(f"{PARSED_DIR}/VUOSI=*"):
+        if glob.glob(f"{path}/*.parquet"):
+            years.append(int(path.split("=")[-1]))
+    return sorted(years)
+
+def raw_years():
+    # Return the years for which raw data is available
+    years = []
+    for path in glob.glob("../raw_data_*.csv"):
+        name = os.path.basename(path)[9:-4]
+        if name.isdigit():
+            years.append(int(name))
+    return sorted(years)
+
+def parsed_files(year: int, months=None):
+    files = sorted(glob.glob(f"{year_dir(year)}/*.parquet"))
+    if months is None:
+        return files
+
+    # Month partitions can be skipped without reading them
+    selected = []
+    for f in files:
+        name = os.path.basename(f)
+        if not name.startswith("KUUKAUSI=") or int(name[9:11]) in months:
+            selected.append(f)
+    return selected
+
+def read_parsed(years, columns=None, months=None):
+    """
+    Read the parsed data of the given years into a single dataframe.
+    Only the listed columns are read from the files.
+    """
+    filters = None if months is None else [("KUUKAUSI", "in", list(months))]
+
+    frames = []
+    for year in years:
+        files = parsed_files(year, months)
+        if not files:
+            print(f"Found no parsed data from {year}")
+            continue
+        frames.extend(pd.read_parquet(f, columns=columns, filters=filters) for f in files)
+
+    if not frames:
+        return None
+
+    # Concatenating categoricals with different categories would give object columns
+    return concat_frames(frames)
+
+def rollup_path(year: int):
+    return f"{PARSED_DIR}/rollup_{year}.parquet"
+
+def file_stamp(files: list):
+    # Identifies the current versions of the files by their names, mtimes and sizes
+    stamp = []
+    for f in files:
+        st = os.stat(f)
+        stamp.append(f"{os.path.basename(f)}:{st.st_mtime_ns}:{st.st_size}")
+    return "|".join(stamp)
+
+def parsed_stamp(year: int):
+    # Changes whenever the year is cleaned again
+    return file_stamp(parsed_files(year))
+
+def write_rollup(cube, year: int):
+    # Write the rollup cube of a year together with the stamp of the parsed files it was built from.
+    # Readers in other processes may rebuild the same cube at the same time, so each writes
+    # to a file of its own and renames it into place.
+    part = f"{rollup_path(year)}.{os.getpid()}.part"
+    cube.to_parquet(part, index=False)
+    os.replace(part, rollup_path(year))
+
+    with open(part, "w", encoding="utf-8") as f:
+        json.dump({"parsed": parsed_stamp(year)}, f)
+    os.replace(part, f"{rollup_path(year)}.json")
+
+def rollup_is_current(year: int):
+    try:
+        with open(f"{rollup_path(year)}.json", encoding="utf-8") as f:
+            stamp = json.load(f)["parsed"]
+    except (FileNotFoundError, KeyError, ValueError):
+        return False
+    return os.path.exists(rollup_path(year)) and stamp == parsed_stamp(year)
+
+def read_rollup(years, columns=None):
+    """
+    Read the rollup cubes of the given years into a single dataframe.
+    A cube that is missing or older than its parsed data is rebuilt first.
+    """
+    frames = []
+    for year in years:
+        if not parsed_files(year):
+            print(f"Found no parsed data from {year}")
+            continue
+        if not rollup_is_current(year):
+            write_rollup(build_cube(read_parsed([year])), year)
+        frames.append(pd.read_parquet(rollup_path(year), columns=columns))
+
+    if not frames:
+        return None
+
+    return concat_frames(frames)
@@ -1,6 +1,7 @@
-import glob
-from web_requests import get_passenger_data
+from web_requests import get_passenger_data, sync_passenger_data
 from data_cleaner import clean_data
+from storage import raw_years
+from sqlite_store import sync_parsed
 from plot_functions import (
     plot_monthly_nousijat,
     plot_weekday_nousijat,
@@ -15,20 +16,21 @@ class UserInterface:
 
     def __init__(self, columns):
         self.cols = columns
-        self.raw_years = glob.glob("../raw_data_*.csv")
-        self.parsed_years = glob.glob("../parsed_data_*.csv")
+        self.raw_years = raw_years()
+        # Loads any parsed years that are not yet in the database
+        self.parsed_years = sync_parsed()
 
     def print_raw_years(self):
         # Print a list of years for which raw data is available
         print("\nFound raw data from years")
         for year in self.raw_years:
-            print(year[-8:-4])
+            print(year)
 
     def print_parsed_years(self):
         # Print a list of years for which parsed data is available
         print("\nFound parsed data from years")
         for year in self.parsed_years:
-            print(year[-8:-4])
+            print(year)
 
     def run(self):
         while True:
@@ -48,17 +50,21 @@ class UserInterface:
                     start = int(input("Enter a starting year (20xx): "))
                     end = input("Enter an ending year (20xx) or press enter: ")
                     end = start if len(end) == 0 else int(end)
+                    only_new = input("Fetch only new rows? (y/n): ") == "y"
 
                     if self.validate_year_input(start, end):
                         for i in range(start, end+1):
-                            get_passenger_data(i)
-                    self.raw_years = glob.glob("../raw_data_*.csv")
+                            if only_new:
+                                sync_passenger_data(i)
+                            else:
+                                get_passenger_data(i)
+                    self.raw_years = raw_years()
 
                 case 2:
                     self.print_raw_years()
                     year = input("Enter a year: ")
                     clean_data(f"../raw_data_{year}.csv", self.cols)
-                    self.parsed_years = glob.glob("../parsed_data_*.csv")
+                    self.parsed_years = sync_parsed()
 
 
                 case 3:
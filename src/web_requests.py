@@ -1,27 +1,207 @@
-import pandas as pd
+import os
+import json
+import time
 import requests
 import csv
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-def get_passenger_data(year: int):
-    # Fetch the Suomenlinna ferry data from the api and write it to a csv file
+API_URL = "https://louhin.hsl.fi/api/1.0/data/257001"
+HEADERS = {"Authorization": "LWS d59c041a-2ad1-4beb-b769-b9d7ea3a5628"}
+
+# Keeps track of the last fetched row of each year
+MANIFEST = "../raw_manifest.json"
+
+# Paging of the louhin API
+PAGE_SIZE = 5000
+MAX_WORKERS = 4
+
+# Size of the chunks read from a response
+CHUNK_SIZE = 64 * 1024
+
+# Retry policy for a single page
+RETRIES = 5
+BACKOFF = 0.5
+
+
+class RequestDenied(Exception):
+    pass
+
+
+def create_session(workers: int):
+    # Create a session whose connection pool is shared by all the workers
+    s = requests.Session()
+    s.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    s.mount("https://", adapter)
+    return s
+
+def stream_rows(response):
+    # Decode and parse the response body line by line as it arrives
+    response.encoding = "latin-1"
+    lines = response.iter_lines(chunk_size=CHUNK_SIZE, decode_unicode=True)
+    return csv.reader(lines, delimiter=";")
+
+def write_rows(writer, rows: list, width: int, start: int):
+    # Write rows in the same layout as pandas' to_csv, numbering them from start
+    for i, row in enumerate(rows, start):
+        writer.writerow([i] + row + [""] * (width - len(row)))
+    return start + len(rows)
+
+def fetch_page(s, year: int, offset: int, limit: int):
+    # Fetch one page of rows. Returns the header and the data rows of the page.
+    params = {"filter[VUOSI]": year, "offset": offset, "limit": limit}
+
+    for attempt in range(RETRIES):
+        try:
+            with s.get(API_URL, params=params, timeout=60, stream=True) as response:
+                if response.status_code == 401:
+                    raise RequestDenied()
+                response.raise_for_status()
+
+                rows = [row for row in stream_rows(response) if row]
+            if not rows:
+                return None, []
+            return rows[0], rows[1:]
+        except requests.RequestException as e:
+            if attempt == RETRIES - 1:
+                raise
+            wait = BACKOFF * 2**attempt
+            print(f"Page at offset {offset} failed ({e}), retrying in {wait}s")
+            time.sleep(wait)
+
+def fetch_pages(year: int, start: int = 0, page_size: int = PAGE_SIZE, workers: int = MAX_WORKERS):
+    """
+    Fetch the rows of a year page by page, starting from row number start.
+    Pages are downloaded concurrently in batches of `workers` pages and yielded
+    in order as (header, rows) tuples. Stops at the first page that is not full.
+    """
+    with create_session(workers) as s, ThreadPoolExecutor(max_workers=workers) as executor:
+        offset = start
+        while True:
+            offsets = [offset + i*page_size for i in range(workers)]
+            pages = executor.map(lambda o: fetch_page(s, year, o, page_size), offsets)
+
+            for header, rows in pages:
+                yield header, rows
+                if len(rows) < page_size:
+                    return
+
+            offset += workers*page_size
+
+def load_manifest():
+    # Read the sync manifest, which maps years to their last fetched row
+    try:
+        with open(MANIFEST, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def update_manifest(year: int, header: list, rows: int, last_row: list, full: bool = False):
+    # Record the number of rows and the last fetched row of a year. A full fetch
+    # starts a new entry, so no last row of an older fetch is kept.
+    manifest = load_manifest()
+    entry = {} if full else manifest.get(str(year), {})
+    entry["rows"] = rows
+    if last_row is not None:
+        entry["last_id"] = int(last_row[header.index("ID")])
+        entry["last_date"] = last_row[header.index("PÄIVÄMÄÄRÄ")]
+    manifest[str(year)] = entry
+
+    with open(f"{MANIFEST}.part", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{MANIFEST}.part", MANIFEST)
+
+def get_passenger_data(year: int, page_size: int = PAGE_SIZE, workers: int = MAX_WORKERS):
+    """
+    Fetch the Suomenlinna ferry data from the api and write it to a csv file.
+    Pages are written to disk as soon as they arrive, so at most `workers`
+    pages are held in memory at a time.
+    """
     print(f"Fetching data from {year}...")
 
-    with requests.Session() as s:
-        headers = {"Authorization": "LWS d59c041a-2ad1-4beb-b769-b9d7ea3a5628"}
-        
-        # Get passenger data
-        passenger_data = s.get(f"https://louhin.hsl.fi/api/1.0/data/257001?filter[VUOSI]={year}", headers=headers)
-        if passenger_data.status_code == 401:
-            print("Request denied")
+    path = f"../raw_data_{year}.csv"
+    header = None
+    last_row = None
+    try:
+        with open(f"{path}.part", "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            for page_header, rows in fetch_pages(year, page_size=page_size, workers=workers):
+                if header is None:
+                    if page_header is None:
+                        break
+                    header = page_header
+                    writer.writerow([""] + list(range(len(header))))
+                    n = write_rows(writer, [header], len(header), 0)
+                n = write_rows(writer, rows, len(header), n)
+                last_row = rows[-1] if rows else last_row
+
+        if header is None:
+            print(f"Found no data from {year}")
             return
-        
-        passenger_data = passenger_data.content.decode("latin-1")
+        os.replace(f"{path}.part", path)
+    except RequestDenied:
+        print("Request denied")
+        return
+    except requests.RequestException as e:
+        print(f"Fetching data from {year} failed ({e})")
+        return
+    finally:
+        # Only a complete download replaces the csv file, anything else is thrown away
+        if os.path.exists(f"{path}.part"):
+            os.remove(f"{path}.part")
+
+    update_manifest(year, header, n - 1, last_row, full=True)
+    print("Wrote data to csv file")
+
+def sync_passenger_data(year: int, page_size: int = PAGE_SIZE, workers: int = MAX_WORKERS):
+    """
+    Fetch only the rows added after the last fetch of a year and append them
+    to the raw data file. Falls back to a full fetch if the year has not been
+    fetched before.
+    """
+    path = f"../raw_data_{year}.csv"
+    entry = load_manifest().get(str(year))
+    if entry is None or "last_id" not in entry or not os.path.exists(path):
+        get_passenger_data(year, page_size, workers)
+        return
+
+    print(f"Syncing data from {year} after {entry['last_date']}...")
+
+    n = entry["rows"] + 1
+    header = None
+    last_row = None
+    # A failed sync cuts the file back to this size, so it never keeps rows the manifest doesn't know of
+    size = os.path.getsize(path)
+    try:
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            for page_header, rows in fetch_pages(year, start=entry["rows"], page_size=page_size, workers=workers):
+                if page_header is None:
+                    break
+                header = page_header
+                idx_id = header.index("ID")
 
-        # Parse data
-        reader = csv.reader(passenger_data.splitlines(), delimiter=";")
+                # The offset only skips rows we already have if the order of the rows
+                # is stable, so drop anything at or below the last fetched ID as well
+                rows = [row for row in rows if int(row[idx_id]) > entry["last_id"]]
+                n = write_rows(writer, rows, len(header), n)
+                last_row = rows[-1] if rows else last_row
+    except RequestDenied:
+        print("Request denied")
+        os.truncate(path, size)
+        return
+    except requests.RequestException as e:
+        print(f"Syncing data from {year} failed ({e})")
+        os.truncate(path, size)
+        return
+    except Exception:
+        os.truncate(path, size)
+        raise
 
-        # Save to csv file
-        df = pd.DataFrame(reader)
-        df.to_csv(f"../raw_data_{year}.csv")
+    if last_row is None:
+        print("Found no new rows")
+        return
 
-        print("Wrote data to csv file")
+    update_manifest(year, header, n - 1, last_row)
+    print(f"Appended {n - 1 - entry['rows']} new rows to csv file")
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+def windows(series, width: int):
+    # Zero-copy view of all the windows of `width` consecutive values of the series
+    values = np.ascontiguousarray(np.asarray(series, dtype=float))
+    return sliding_window_view(values, width)
+
+def calendar_features(index):
+    # Weekday, month and day of year of each date, known in advance for any forecast date
+    dates = pd.DatetimeIndex(pd.to_datetime(index))
+    return np.column_stack([dates.weekday, dates.month, dates.dayofyear]).astype(float)
+
+def supervised_windows(series, n_lags: int, n_forecasts: int = 1, exog=None, calendar: bool = False):
+    """
+    Build the lag matrix X and the target matrix y of a series.
+    Row i of X holds the n_lags values before time t = n_lags + i and row i of
+    y the n_forecasts values starting at t. Both are views into a single array,
+    so nothing is copied unless extra features are requested.
+
+    exog is an array (or dataframe) with one row per value of the series. Its
+    row at time t is appended to X, as are the calendar features of t if
+    calendar is set (the series needs a date index for that).
+    """
+    w = windows(series, n_lags + n_forecasts)
+    X, y = w[:, :n_lags], w[:, n_lags:]
+
+    extra = []
+    targets = slice(n_lags, n_lags + len(w))
+    if exog is not None:
+        exog = np.asarray(exog, dtype=float)
+        extra.append(exog.reshape(len(exog), -1)[targets])
+    if calendar:
+        extra.append(calendar_features(series.index[targets]))
+
+    if extra:
+        X = np.hstack([X, *extra])
+
+    return X, y
+
+def lag_frame(series, n_lags: int):
+    # Dataframe of the series and its n_lags previous values as lag_1 ... lag_n columns
+    w = windows(series, n_lags + 1)
+    columns = {series.name: w[:, n_lags]}
+    for lag in range(1, n_lags + 1):
+        columns[f"lag_{lag}"] = w[:, n_lags - lag]
+    return pd.DataFrame(columns, index=series.index[n_lags:])